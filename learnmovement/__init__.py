@@ -0,0 +1,16 @@
+"""Trajectory simulation, extraction, cleaning and prediction for a fixed roadside unit.
+
+The modules live in ``simulation/`` and ``realData/`` and are imported flat
+by their scripts; this package puts both folders at the front of the path
+(so an installed module of the same name cannot shadow them) and exposes
+them through one command line: ``learnmovement <command>`` once installed
+with ``pip install -e .``, or ``python -m learnmovement <command>``.
+"""
+import os
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("simulation", "realData"):
+    path = os.path.join(root, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,3 @@
+from learnmovement.cli import main
+
+main()
@@ -0,0 +1,160 @@
+"""Unified command line: simulate, noise, clean, extract, predict, render, bench and live.
+
+Only argparse is imported up front. Every command imports what it needs
+when it runs, so e.g. ``predict`` never loads PIL, moviepy or YOLO unless
+it is asked to draw. Text datasets are converted to a ``.traj`` store on
+first load and reused by later runs (see ``trajstore.load``).
+"""
+import argparse
+import sys
+
+import learnmovement  # noqa: F401  (puts simulation/ and realData/ on the path)
+
+
+def simulate(argv):
+    import sim
+
+    parser = argparse.ArgumentParser(prog="learnmovement simulate", description="Generate roundabout trajectories.")
+    parser.add_argument("-o", "--output", default="data.traj", help="Trajectory store to write")
+    parser.add_argument("-n", "--num-objects", type=int, default=sim.num_objects)
+    parser.add_argument("--seed", type=int, default=sim.seed)
+    parser.add_argument("--video", default=None, help="Also render a preview video to this file")
+    parser.add_argument("--frames", type=int, default=sim.num_frames, help="Frames of the preview video")
+    args = parser.parse_args(argv)
+
+    store = sim.simulate(args.output, args.num_objects, args.seed)
+    print(f"{len(store)} trajectories saved to {args.output}")
+    if args.video:
+        from render import render_store
+
+        render_store(store, args.video, num_frames=args.frames)
+
+
+def noise(argv):
+    parser = argparse.ArgumentParser(prog="learnmovement noise", description="Add detection-like noise to a store.")
+    parser.add_argument("-i", "--input", default="data.traj")
+    parser.add_argument("-o", "--output", default="data_with_noise.traj")
+    parser.add_argument("--uniform", type=float, default=0.1, help="Maximum uniform noise per coordinate (0 disables)")
+    parser.add_argument("--gaussian", type=float, default=None, help="Gaussian noise sigma")
+    parser.add_argument("--correlated", type=float, default=None, help="AR(1) drift sigma")
+    parser.add_argument("--rho", type=float, default=0.9, help="AR(1) correlation of the drift")
+    parser.add_argument("--drop", type=float, default=None, help="Probability of dropping each frame")
+    parser.add_argument("--switch", type=float, default=None, help="Probability of an id switch per trajectory")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    import trajstore
+    from noise import CorrelatedNoise, DroppedFrames, GaussianNoise, IdSwitches, UniformNoise, add_noise
+
+    models = []
+    if args.uniform:
+        models.append(UniformNoise(args.uniform))
+    if args.gaussian:
+        models.append(GaussianNoise(args.gaussian))
+    if args.correlated:
+        models.append(CorrelatedNoise(args.correlated, rho=args.rho))
+    if args.drop:
+        models.append(DroppedFrames(args.drop))
+    if args.switch:
+        models.append(IdSwitches(args.switch))
+    add_noise(trajstore.load(args.input), args.output, models, seed=args.seed, chunk_size=args.chunk_size)
+    print(f"Noisy trajectories saved to {args.output}")
+
+
+def clean(argv):
+    import dataclean
+
+    parser = argparse.ArgumentParser(prog="learnmovement clean", description="Clean a DeepSort detection file.")
+    parser.add_argument("-i", "--input", default=dataclean.input_file)
+    parser.add_argument("-o", "--output", default=dataclean.output_file)
+    parser.add_argument("--min-length", type=int, default=dataclean.min_length)
+    parser.add_argument("--keep-stationary", action="store_true", help="Keep repeated points of standing objects")
+    parser.add_argument("--max-step", type=float, default=dataclean.max_step, help="Split tracks at longer jumps")
+    parser.add_argument("--merge-window", type=int, default=dataclean.merge_window)
+    parser.add_argument("--workers", type=int, default=dataclean.workers)
+    parser.add_argument("--follow", action="store_true", help="Clean while the extractor is still writing")
+    parser.add_argument("--homography", default=dataclean.homography_file, help="Write ground-plane coordinates")
+    args = parser.parse_args(argv)
+
+    count = dataclean.clean_file(
+        args.input, args.output, min_length=args.min_length, drop_stationary=not args.keep_stationary,
+        max_step=args.max_step, merge_window=args.merge_window, workers=args.workers,
+        follow_input=args.follow, homography_file=args.homography,
+    )
+    print(f"{count} cleaned tracks saved to {args.output}")
+
+
+def extract(argv):
+    import dataGen  # OpenCV here; YOLO and DeepSort only once the models are loaded
+
+    dataGen.main(argv)
+
+
+def predict(argv):
+    from bench import engines  # The engine names of bench and live serve
+
+    parser = argparse.ArgumentParser(
+        prog="learnmovement predict", add_help=False,
+        description="Replay test trajectories through a predictor; other options as in headless.main.",
+    )
+    parser.add_argument("--engine", choices=list(engines), default="position")
+    parser.add_argument("--scale", type=float, default=1.0, help="Data units per simulation unit, for the thresholds")
+    args, rest = parser.parse_known_args(argv)
+
+    import headless
+
+    def make_engine(trajectories, test_ids):
+        return engines[args.engine](trajectories, args.scale, exclude=test_ids)
+
+    headless.main(
+        make_engine, rest, data="data_with_noise.traj", video=f"prediction_{args.engine}.mp4",
+        prog=f"learnmovement predict --engine {args.engine}",
+    )
+
+
+def render(argv):
+    parser = argparse.ArgumentParser(prog="learnmovement render", description="Render a store to a video.")
+    parser.add_argument("-i", "--input", default="data_with_noise.traj", help="Trajectory store or text file")
+    parser.add_argument("-o", "--output", default="replicated.mp4")
+    parser.add_argument("--frames", type=int, default=None, help="Frames to render (default: longest trajectory)")
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    import trajstore
+    from render import render_store
+
+    render_store(trajstore.load(args.input), args.output, num_frames=args.frames, fps=args.fps)
+    print(f"Video saved to {args.output}")
+
+
+def bench(argv):
+    import bench as benchmark
+
+    benchmark.main(argv)
+
+
+def live(argv):
+    import live as service
+
+    service.main(argv)
+
+
+commands = {
+    "simulate": simulate,
+    "noise": noise,
+    "clean": clean,
+    "extract": extract,
+    "predict": predict,
+    "render": render,
+    "bench": bench,
+    "live": live,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="learnmovement", description="RSU trajectory toolkit.")
+    parser.add_argument("command", choices=list(commands))
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Options of the command (see <command> --help)")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    commands[args.command](args.args)
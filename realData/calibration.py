@@ -0,0 +1,191 @@
+"""Camera-to-ground calibration of pixel tracks and a cached occupancy/flow grid of the fixed scene."""
+import hashlib
+import os
+
+import numpy as np
+
+from cleaning import parallel_parse
+
+
+def fit_homography(pixel_points, ground_points):
+    """Fits the 3x3 homography mapping pixel points to ground points (4+ correspondences, DLT)."""
+    pixel_points = np.asarray(pixel_points, dtype=np.float64)
+    ground_points = np.asarray(ground_points, dtype=np.float64)
+    if len(pixel_points) < 4 or pixel_points.shape != ground_points.shape:
+        raise ValueError("A homography needs at least 4 matching point pairs")
+
+    # Normalizing both sides keeps the linear system well conditioned
+    def normalizer(points):
+        center = points.mean(axis=0)
+        scale = np.sqrt(2) / max(np.hypot(*(points - center).T).mean(), 1e-12)
+        return np.array([[scale, 0, -scale * center[0]], [0, scale, -scale * center[1]], [0, 0, 1]])
+
+    source_norm, target_norm = normalizer(pixel_points), normalizer(ground_points)
+    (x, y), (u, v) = to_ground(pixel_points, source_norm).T, to_ground(ground_points, target_norm).T
+    zeros, ones = np.zeros_like(x), np.ones_like(x)
+    rows = np.concatenate([
+        np.column_stack((-x, -y, -ones, zeros, zeros, zeros, u * x, u * y, u)),
+        np.column_stack((zeros, zeros, zeros, -x, -y, -ones, v * x, v * y, v)),
+    ])
+    homography = np.linalg.svd(rows)[2][-1].reshape(3, 3)
+    homography = np.linalg.inv(target_norm) @ homography @ source_norm
+    return homography / homography[2, 2]
+
+
+def load_homography(path):
+    """Loads a homography saved as a 3x3 matrix (.npy or text), or fits one from a text file
+    of ``px py gx gy`` correspondence rows."""
+    data = np.load(path) if path.endswith(".npy") else np.loadtxt(path, delimiter="," if path.endswith(".csv") else None)
+    data = np.asarray(data, dtype=np.float64)
+    if data.shape == (3, 3):
+        return data
+    if data.ndim == 2 and data.shape[1] == 4:
+        return fit_homography(data[:, :2], data[:, 2:])
+    raise ValueError(f"{path} holds neither a 3x3 homography nor px py gx gy rows")
+
+
+def to_ground(points, homography):
+    """Maps an (..., 2) array of pixel points to the ground plane in one pass."""
+    points = np.asarray(points, dtype=np.float64)
+    mapped = points @ homography[:, :2].T + homography[:, 2]
+    return mapped[..., :2] / mapped[..., 2:]
+
+
+def calibrate(tracks, homography):
+    """Converts a stream of (label, pixel points) pairs to ground-plane coordinates."""
+    for label, points in tracks:
+        yield label, to_ground(points, homography)
+
+
+def read_tracks(path, homography=None):
+    """Streams (label, points) pairs from a track file, calibrated when a homography is given."""
+    with open(path, "r") as file:
+        tracks = parallel_parse(file, workers=1)
+        yield from calibrate(tracks, homography) if homography is not None else tracks
+
+
+class SceneGrid:
+    """Static occupancy and mean flow of the scene on a uniform grid, learned from historical tracks.
+
+    Since the camera never moves, where objects have (and have never) been is
+    a property of the scene. Checking a candidate future against the grid is
+    a few array lookups, which lets a predictor drop impossible futures (off
+    the road, against the traffic) before comparing it with stored tracks.
+    """
+
+    def __init__(self, origin, cell_size, counts, flow):
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.cell_size = float(cell_size)
+        self.counts = np.asarray(counts, dtype=np.int64)  # (rows, cols) points seen per cell
+        self.flow = np.asarray(flow, dtype=np.float64)  # (rows, cols, 2) mean step leaving each cell
+        self.shape = np.array(self.counts.shape[::-1])  # (cols, rows), in x, y order
+
+    @classmethod
+    def build(cls, tracks, cell_size, bounds, batch_points=1_000_000):
+        """Accumulates a grid over bounds (xmin, ymin, xmax, ymax) from a stream of (label, points)."""
+        origin = np.array(bounds[:2], dtype=np.float64)
+        cols, rows = np.floor((np.array(bounds[2:]) - origin) / cell_size).astype(np.int64) + 1
+        grid = cls(origin, cell_size, np.zeros((rows, cols), dtype=np.int64), np.zeros((rows, cols, 2)))
+        counts = np.zeros(rows * cols, dtype=np.int64)
+        departures = np.zeros(rows * cols, dtype=np.int64)
+        steps = np.zeros((rows * cols, 2))
+
+        # Tracks are gathered into large batches so each bincount covers many of them
+        def accumulate(batch):
+            points = np.concatenate([points for points, _ in batch])
+            has_next = np.concatenate([has_next for _, has_next in batch])
+            cells = grid.cells(points)
+            counts[:] += np.bincount(cells[cells >= 0], minlength=rows * cols)
+            leaving = has_next & (cells >= 0)  # Steps from a point to the next one of the same track
+            departures[:] += np.bincount(cells[leaving], minlength=rows * cols)
+            moves = np.diff(points, axis=0, append=points[-1:])
+            for axis in range(2):
+                steps[:, axis] += np.bincount(cells[leaving], weights=moves[leaving, axis], minlength=rows * cols)
+
+        batch, size = [], 0
+        for _, points in tracks:
+            points = np.asarray(points, dtype=np.float64)
+            batch.append((points, np.arange(len(points)) < len(points) - 1))
+            size += len(points)
+            if size >= batch_points:
+                accumulate(batch)
+                batch, size = [], 0
+        if batch:
+            accumulate(batch)
+        flow = steps / np.maximum(departures, 1)[:, None]
+        return cls(origin, cell_size, counts.reshape(rows, cols), flow.reshape(rows, cols, 2))
+
+    @classmethod
+    def from_file(cls, path, cell_size, homography=None, bounds=None):
+        """Builds the grid of a track file, streaming it twice when the bounds must be measured first."""
+        if bounds is None:
+            low, high = np.full(2, np.inf), np.full(2, -np.inf)
+            for _, points in read_tracks(path, homography):
+                low, high = np.minimum(low, points.min(axis=0)), np.maximum(high, points.max(axis=0))
+            bounds = (*low, *high)
+        return cls.build(read_tracks(path, homography), cell_size, bounds)
+
+    def save(self, path):
+        np.savez(path, origin=self.origin, cell_size=self.cell_size, counts=self.counts, flow=self.flow)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["origin"], float(data["cell_size"]), data["counts"], data["flow"])
+
+    @classmethod
+    def load_or_build(cls, path, cell_size, homography=None, bounds=None):
+        """Loads the grid cached beside a track file, building it when missing or stale.
+
+        The cache name includes a hash of the homography and bounds, so a new
+        calibration or area never reuses a grid built for another one.
+        """
+        suffix = "ground" if homography is not None else "pixel"
+        key = [None if value is None else np.asarray(value, dtype=np.float64).tolist() for value in (homography, bounds)]
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:12]
+        cache_path = f"{os.path.splitext(path)[0]}_grid_{suffix}_{cell_size:g}_{digest}.npz"
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            return cls.load(cache_path)
+        grid = cls.from_file(path, cell_size, homography=homography, bounds=bounds)
+        grid.save(cache_path)
+        return grid
+
+    def cells(self, points):
+        """Flat cell index of every point, -1 outside the grid or for NaN padding."""
+        points = np.asarray(points, dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            cell = np.floor((points - self.origin) / self.cell_size)
+        inside = np.all((cell >= 0) & (cell < self.shape), axis=-1)
+        cell = np.where(inside[..., None], cell, 0).astype(np.int64)
+        return np.where(inside, cell[..., 1] * self.shape[0] + cell[..., 0], -1)
+
+    def occupancy(self, points):
+        """Points seen in the cell of every point (0 outside the grid)."""
+        cells = self.cells(points)
+        return np.where(cells >= 0, self.counts.ravel()[np.maximum(cells, 0)], 0)
+
+    def flow_at(self, points):
+        """Mean historical step from the cell of every point (zero outside the grid)."""
+        cells = self.cells(points)
+        return np.where((cells >= 0)[..., None], self.flow.reshape(-1, 2)[np.maximum(cells, 0)], 0.0)
+
+    def plausible(self, paths, min_count=1, min_alignment=None):
+        """Flags which of (K, H, 2) candidate paths only visit cells seen at least min_count times.
+
+        With ``min_alignment`` the steps must also follow the cells' mean flow:
+        their average cosine to it must reach min_alignment, so a path driven
+        against the traffic is rejected while single noisy steps are not. NaN
+        padding of shorter paths is ignored.
+        """
+        paths = np.asarray(paths, dtype=np.float64)
+        present = ~np.isnan(paths[..., 0])
+        ok = np.all(~present | (self.occupancy(paths) >= min_count), axis=-1)
+        if min_alignment is not None and paths.shape[-2] > 1:
+            moves = np.diff(paths, axis=-2)
+            flows = self.flow_at(paths[..., :-1, :])
+            norms = np.hypot(*np.moveaxis(moves, -1, 0)) * np.hypot(*np.moveaxis(flows, -1, 0))
+            cosine = np.divide((moves * flows).sum(axis=-1), norms, out=np.ones_like(norms), where=norms > 0)
+            steps = present[..., 1:] & (norms > 0)
+            mean_cosine = np.where(steps, cosine, 0).sum(axis=-1) / np.maximum(steps.sum(axis=-1), 1)
+            ok &= mean_cosine >= min_alignment
+        return ok
@@ -0,0 +1,116 @@
+"""Streaming, bounded-memory cleaning of ``label -> [(x, y), ...]`` detection files."""
+import itertools
+import multiprocessing
+import os
+import re
+from collections import deque
+
+import numpy as np
+
+from tracksink import format_track
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?")
+_LABEL = re.compile(r"^(.*?)(\d+)$")  # Class name and id, split like trajstore does
+
+
+def parse_lines(lines):
+    """Parses a chunk of lines into (label, points) pairs without eval."""
+    tracks = []
+    for line in lines:
+        if "->" not in line:
+            continue
+        label, values = line.split("->", 1)
+        dtype = np.float64 if "." in values or "e" in values else np.int64
+        points = np.array(_NUMBER.findall(values), dtype=dtype).reshape(-1, 2)
+        tracks.append((label.strip(), points))
+    return tracks
+
+
+def parallel_parse(lines, workers=None, chunk_lines=2000):
+    """Parses line chunks in a process pool, in order, keeping only a few chunks in flight."""
+    chunks = iter(lambda: list(itertools.islice(lines, chunk_lines)), [])
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunks:
+            yield from parse_lines(chunk)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(parse_lines, (chunk,)))
+            if len(in_flight) > 2 * workers:
+                yield from in_flight.popleft().get()
+        while in_flight:
+            yield from in_flight.popleft().get()
+
+
+def merge_fragments(tracks, merge_window=500):
+    """Concatenates fragments of the same id that arrive within merge_window tracks of each other.
+
+    DeepSort fragments of one id are written close together, so an id unseen
+    for merge_window tracks is complete and can be released; memory stays
+    bounded by the window instead of the whole file. ``None`` merges across
+    the whole file.
+    """
+    open_tracks = {}  # label -> (last seen position, fragments), in release order
+    for position, (label, points) in enumerate(tracks):
+        _, fragments = open_tracks.pop(label, (None, []))
+        fragments.append(points)
+        open_tracks[label] = (position, fragments)
+
+        # Dicts keep insertion order, so the stalest id is always first
+        while merge_window is not None and open_tracks:
+            oldest = next(iter(open_tracks))
+            if position - open_tracks[oldest][0] < merge_window:
+                break
+            yield oldest, np.concatenate(open_tracks.pop(oldest)[1])
+    for label, (_, fragments) in open_tracks.items():
+        yield label, np.concatenate(fragments)
+
+
+def clean_track(points, drop_stationary=True, max_step=None):
+    """Removes repeated stationary points and splits the track at teleport jumps.
+
+    Returns the list of remaining pieces.
+    """
+    if drop_stationary and len(points) > 1:
+        moved = np.any(np.diff(points, axis=0) != 0, axis=1)
+        points = points[np.concatenate(([True], moved))]
+    if max_step is not None and len(points) > 1:
+        jumps = np.nonzero(np.hypot(*np.diff(points, axis=0).T.astype(np.float64)) > max_step)[0] + 1
+        return np.split(points, jumps)
+    return [points]
+
+
+def clean(lines, min_length=10, drop_stationary=True, max_step=None, merge_window=500, workers=None):
+    """Generator pipeline: parse, merge fragments by id, clean, and drop short tracks.
+
+    Pieces of a track split at a jump, and tracks of an id reused beyond the
+    merge window, are different objects: every repeat of a label gets the
+    same class with a fresh id above every id seen so far (``car7`` and
+    ``car393``), so cleaning the output again does not merge them back.
+    """
+    tracks = merge_fragments(parallel_parse(iter(lines), workers=workers), merge_window=merge_window)
+    yielded = set()  # Labels already used; one entry per track, not per point
+    next_id = 0  # Above every id seen or handed out so far
+    for label, points in tracks:
+        match = _LABEL.match(label)
+        name = match.group(1) if match else label
+        if match:
+            next_id = max(next_id, int(match.group(2)) + 1)
+        for piece in clean_track(points, drop_stationary=drop_stationary, max_step=max_step):
+            if len(piece) >= min_length:
+                if label in yielded:
+                    label, next_id = f"{name}{next_id}", next_id + 1
+                yielded.add(label)
+                yield label, piece
+
+
+def write_tracks(tracks, output_file):
+    """Writes (label, points) pairs in the ``label -> [(x, y), ...]`` format."""
+    count = 0
+    with open(output_file, "w") as file:
+        for label, points in tracks:
+            file.write(format_track(label, [tuple(point) for point in points.tolist()]))
+            count += 1
+    return count
@@ -1,9 +1,17 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
 import logging, sys
+import argparse
+import multiprocessing
+import os
+import queue
+import re
+import threading
 from tqdm import tqdm
+from tracksink import TrackSink
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "simulation"))
+import instrument  # Timing spans and counters, shared with the simulation scripts
 
 # AVOID PRINTING YOLO OUTPUT
 logger = logging.getLogger()
@@ -14,85 +22,296 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 logging.getLogger("ultralytics").setLevel(logging.WARNING)
 
-# Initialize YOLO and DeepSort
-model = YOLO("models/yolo11s.pt")  # Use the correct YOLO model path
-tracker = DeepSort(max_age=100, n_init=2, nn_budget=200)
-
-# Open the video file
+# Parameters
 video_path = "vid.mkv"
-cap = cv2.VideoCapture(video_path)
+output_file = "data.txt"
+model_path = "models/yolo11s.pt"  # Use the correct YOLO model path
+max_track_length = 1000  # Write long-lived tracks out in fragments of this many points
+batch_size = 8  # Frames per YOLO inference call
+queue_depth = 32  # Decoded frames buffered ahead of inference
+frame_stride = 1  # Process every Nth frame only
+video_extensions = (".mkv", ".mp4", ".avi", ".mov")  # Picked up when a directory is given
 
-if not cap.isOpened():
-    print(f"Error: Unable to open video file {video_path}")
-    sys.exit()
+# Models of this worker process, loaded once by init_worker
+worker_models = None
 
-# Prepare the output file
-output_file = "data.txt"
-with open(output_file, "w") as f:
-    f.write("")  # Clear the file content if it exists
-
-frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-progress_bar = tqdm(total=frame_count, desc="Processing Frames")
-
-# Store active trajectories in memory
-active_trajectories = {}
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    progress_bar.update(1)
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    
-    # Perform object detection
-    results = model(frame_rgb)
-    
-    # Extract bounding boxes and class names
+def load_models():
+    """Initialize YOLO and DeepSort."""
+    # Imported here: they take seconds to load and only extraction needs them
+    from ultralytics import YOLO
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+
+    model = YOLO(model_path)
+    tracker = DeepSort(max_age=100, n_init=2, nn_budget=200)
+    return model, tracker
+
+def decode_frames(cap, frames, frame_stride, progress_bar, num_frames=None, stop=None):
+    """Decode thread: reads, subsamples and color-converts frames into a bounded queue until done or stopped."""
+    try:
+        frame_idx = 0
+        while (num_frames is None or frame_idx < num_frames) and not (stop and stop.is_set()):
+            # Skipped frames are only grabbed, never retrieved or converted
+            if frame_idx % frame_stride:
+                with instrument.span("decode.grab"):
+                    ok = cap.grab()
+            else:
+                with instrument.span("decode"):
+                    ok, frame = cap.read()
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if ok else None
+                if ok:
+                    with instrument.span("decode.queue_full"):  # Backpressure from inference
+                        frames.put(frame_rgb)
+            if not ok:
+                break
+            progress_bar.update(1)
+            frame_idx += 1
+    finally:
+        frames.put(None)  # End of stream
+
+def iter_batches(frames, batch_size):
+    """Yields lists of up to batch_size decoded frames, in decode order."""
+    batch = []
+    while True:
+        with instrument.span("detect.queue_empty"):  # Inference starved by decoding
+            frame_rgb = frames.get()
+        if frame_rgb is None:
+            break
+        batch.append(frame_rgb)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def extract_detections(result):
+    """Extract bounding boxes and class names from one YOLO result."""
     detections = []
-    for result in results:
-        for box, confidence, class_id in zip(result.boxes.xyxy, result.boxes.conf, result.boxes.cls):
-            x1, y1, x2, y2 = map(int, box.tolist())
-            detections.append(((x1, y1, x2, y2), confidence.item(), int(class_id)))
-
-    # Update tracker with YOLO detections
-    tracks = tracker.update_tracks(detections, frame=frame_rgb)
-    
-    # Process tracking results
-    lost_ids = set(active_trajectories.keys())  # Start by assuming all are lost
-    for track in tracks:
-        if not track.is_confirmed() or track.time_since_update > 0:
-            continue
+    for box, confidence, class_id in zip(result.boxes.xyxy, result.boxes.conf, result.boxes.cls):
+        x1, y1, x2, y2 = map(int, box.tolist())
+        detections.append(((x1, y1, x2, y2), confidence.item(), int(class_id)))
+    return detections
+
+def extract(video_path, output_file, model, tracker, batch_size=8, queue_depth=32, frame_stride=1,
+            start_frame=0, end_frame=None, progress=True):
+    """Runs decode, batched detection and in-order tracking over one video (or a frame range of it) into output_file."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Unable to open video file {video_path}")
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        # The sink closes (and removes its .writing marker) even on error, so follow() always ends
+        with TrackSink(output_file, flush_every=64, flush_interval=5.0) as sink:
+            track_video(cap, sink, model, tracker, batch_size, queue_depth, frame_stride, start_frame, end_frame,
+                        progress)
+    finally:
+        cap.release()
+
+def track_video(cap, sink, model, tracker, batch_size, queue_depth, frame_stride, start_frame, end_frame, progress):
+    """Decodes on a thread, detects in batches and tracks frame by frame, writing finished tracks to sink."""
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    num_frames = None if end_frame is None else end_frame - start_frame
+    progress_bar = tqdm(total=num_frames or frame_count - start_frame, desc="Processing Frames", disable=not progress)
+
+    # Decode ahead on its own thread; the bounded queue applies backpressure
+    frames = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    decoder = threading.Thread(
+        target=decode_frames, args=(cap, frames, frame_stride, progress_bar, num_frames, stop), daemon=True
+    )
+    decoder.start()
+
+    # Store active trajectories in memory
+    active_trajectories = {}
+
+    try:
+        for batch in iter_batches(frames, batch_size):
+            # Perform object detection on the whole batch at once
+            with instrument.span("detect"):
+                results = model(batch)
+
+            # Tracking must see frames in order, one at a time
+            for frame_rgb, result in zip(batch, results):
+                detections = extract_detections(result)
+                instrument.count("detections_per_frame", len(detections))
+
+                # Update tracker with YOLO detections
+                with instrument.span("track"):
+                    tracks = tracker.update_tracks(detections, frame=frame_rgb)
+                written = sink.tracks_written
 
-        track_id = track.track_id
-        x1, y1, x2, y2 = map(int, track.to_tlbr())  # Convert to top-left and bottom-right coordinates
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2  # Center point
+                # Process tracking results
+                lost_ids = set(active_trajectories.keys())  # Start by assuming all are lost
+                for track in tracks:
+                    if not track.is_confirmed() or track.time_since_update > 0:
+                        continue
 
-        # Label objects based on class IDs from YOLO detections
-        class_id = track.get_det_class() if hasattr(track, 'get_det_class') else None
-        label = f"car{track_id}" if class_id == 2 else f"person{track_id}"
+                    track_id = track.track_id
+                    x1, y1, x2, y2 = map(int, track.to_tlbr())  # Convert to top-left and bottom-right coordinates
+                    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2  # Center point
 
-        # Update trajectory
-        if label not in active_trajectories:
-            active_trajectories[label] = []
+                    # Label objects based on class IDs from YOLO detections
+                    class_id = track.get_det_class() if hasattr(track, 'get_det_class') else None
+                    label = f"car{track_id}" if class_id == 2 else f"person{track_id}"
 
-        active_trajectories[label].append((cx, cy))
-        lost_ids.discard(label)  # This track is still active
+                    # Update trajectory
+                    if label not in active_trajectories:
+                        active_trajectories[label] = []
 
-    # Write trajectories for lost objects
-    with open(output_file, "a") as f:
-        for lost_id in lost_ids:
-            trajectory = active_trajectories.pop(lost_id)
-            trajectory_str = ", ".join([str(pos) if pos is not None else "None" for pos in trajectory])
-            f.write(f"{lost_id} -> [{trajectory_str}]\n")
+                    active_trajectories[label].append((cx, cy))
+                    lost_ids.discard(label)  # This track is still active
 
-cap.release()
-progress_bar.close()
+                    # Bound memory: fragments of one id are merged back by dataclean.py
+                    if len(active_trajectories[label]) >= max_track_length:
+                        sink.write(label, active_trajectories[label])
+                        active_trajectories[label] = []
 
-# Write remaining trajectories
-with open(output_file, "a") as f:
+                # Queue trajectories for lost objects; the sink batches the actual writes
+                with instrument.span("write"):
+                    for lost_id in lost_ids:
+                        sink.write(lost_id, active_trajectories.pop(lost_id))
+                    sink.maybe_flush()
+                instrument.count("tracks_flushed", sink.tracks_written - written)
+                instrument.count("active_tracks", len(active_trajectories))
+    finally:
+        # On error the decoder may be blocked on a full queue: stop it and drain until it exits
+        stop.set()
+        while decoder.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        decoder.join()
+        progress_bar.close()
+
+    # Write remaining trajectories
     for obj_id, trajectory in active_trajectories.items():
-        trajectory_str = ", ".join([str(pos) if pos is not None else "None" for pos in trajectory])
-        f.write(f"{obj_id} -> [{trajectory_str}]\n")
+        sink.write(obj_id, trajectory)
+
+def list_videos(inputs):
+    """Expands directories into the video files they contain."""
+    videos = []
+    for path in inputs:
+        if os.path.isdir(path):
+            videos.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(video_extensions)
+            )
+        else:
+            videos.append(path)
+    return videos
+
+def plan_segments(videos, segment_seconds=None):
+    """Splits every video into (video, start_frame, end_frame) time ranges."""
+    segments = []
+    for video in videos:
+        if not segment_seconds:
+            segments.append((video, 0, None))
+            continue
+        cap = cv2.VideoCapture(video)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        segment_frames = max(1, int(segment_seconds * fps))
+        for start in range(0, frame_count, segment_frames):
+            segments.append((video, start, min(start + segment_frames, frame_count)))
+    return segments
+
+def init_worker(threads, profiling=False):
+    """Loads YOLO and DeepSort once per worker process and pins its thread count."""
+    global worker_models
+    import torch
+
+    instrument.enable(profiling)
+    cv2.setNumThreads(1)
+    torch.set_num_threads(threads)
+    logging.getLogger("ultralytics").setLevel(logging.WARNING)
+    worker_models = load_models()
+
+def extract_segment(task):
+    """Worker task: extracts one segment into its own trajectory file, returning it with the segment's timings."""
+    video, start_frame, end_frame, segment_file, settings = task
+    model, tracker = worker_models
+    tracker.delete_all_tracks()  # Segments are independent
+    instrument.reset()
+    extract(video, segment_file, model, tracker, start_frame=start_frame, end_frame=end_frame, progress=False, **settings)
+    return segment_file, instrument.snapshot()
+
+def merge_segments(segment_files, output_file):
+    """Concatenates segment files, offsetting track ids so they stay globally unique."""
+    label_pattern = re.compile(r"^(\D+)(\d+) ->")
+    id_offset = 0
+    with open(output_file, "w") as output:
+        for segment_file in segment_files:
+            max_id = 0
+            with open(segment_file, "r") as file:
+                for line in file:
+                    match = label_pattern.match(line)
+                    if match is None:
+                        continue
+                    track_id = int(match.group(2))
+                    max_id = max(max_id, track_id)
+                    output.write(f"{match.group(1)}{track_id + id_offset}{line[match.end(2):]}")
+            id_offset += max_id
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract trajectories from RSU videos.")
+    parser.add_argument("inputs", nargs="*", default=[video_path], help="Video files or directories of videos")
+    parser.add_argument("-o", "--output", default=output_file, help="Merged trajectory file")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each with its own models")
+    parser.add_argument("--segment-seconds", type=float, default=None, help="Split videos into time ranges of this length")
+    parser.add_argument("--segments-dir", default=None, help="Where per-segment files go (default: <output>.segments)")
+    parser.add_argument("--batch-size", type=int, default=batch_size)
+    parser.add_argument("--queue-depth", type=int, default=queue_depth)
+    parser.add_argument("--frame-stride", type=int, default=frame_stride)
+    parser.add_argument("--profile", default=None, help="Write per-stage timings and counters to this .json or .csv report")
+    parser.add_argument("--cprofile", default=None, help="Dump cProfile stats of the main process to this file")
+    args = parser.parse_args(argv)
+
+    instrument.enable(args.profile is not None)
+    with instrument.profile(args.cprofile):
+        run(args)
+    if args.profile:
+        instrument.write_report(args.profile)
+        print(f"Timing report saved to {args.profile}")
+
+def run(args):
+    """Extracts every requested video, in this process or in a pool of workers."""
+    settings = {"batch_size": args.batch_size, "queue_depth": args.queue_depth, "frame_stride": args.frame_stride}
+    segments = plan_segments(list_videos(args.inputs), args.segment_seconds)
+
+    # A single segment needs no pool or merge
+    if args.workers <= 1 and len(segments) == 1:
+        model, tracker = load_models()
+        video, start_frame, end_frame = segments[0]
+        try:
+            extract(video, args.output, model, tracker, start_frame=start_frame, end_frame=end_frame, **settings)
+        except IOError as error:
+            print(f"Error: {error}")
+            sys.exit()
+        print(f"Trajectories saved to {args.output}")
+        return
+
+    segments_dir = args.segments_dir or args.output + ".segments"
+    os.makedirs(segments_dir, exist_ok=True)
+    tasks = [
+        (video, start, end, os.path.join(segments_dir, f"{i:05d}_{os.path.basename(video)}_{start}.txt"), settings)
+        for i, (video, start, end) in enumerate(segments)
+    ]
+
+    # Split the cores between workers so their inference threads do not oversubscribe
+    workers = max(1, min(args.workers, len(tasks)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=init_worker, initargs=(threads, instrument.enabled)) as pool:
+        segment_files = []
+        for segment_file, samples in tqdm(pool.imap(extract_segment, tasks), total=len(tasks), desc="Processing Segments"):
+            segment_files.append(segment_file)
+            instrument.merge(samples)
+
+    with instrument.span("merge"):
+        merge_segments(segment_files, args.output)
+    print(f"Trajectories from {len(segment_files)} segments saved to {args.output}")
 
-print("Trajectories saved to data.txt")
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,31 @@
-# Open the input file and read the data
+from calibration import calibrate, load_homography
+from cleaning import clean, write_tracks
+from tracksink import follow
+
+# Parameters
 input_file = "data.txt"
 output_file = "dataClean.txt"
+min_length = 10  # Drop tracks with fewer points than this
+drop_stationary = True  # Remove repeated points of a standing object, e.g. the (994, 772) runs
+max_step = 60  # Split tracks at jumps longer than this many pixels per point (id switches); None keeps them
+merge_window = 500  # Fragments of one id further apart than this many tracks are not merged; None merges all
+workers = None  # Parse processes, defaults to the number of cores
+follow_input = False  # Clean while dataGen.py is still writing the input
+homography_file = None  # Camera homography (3x3, or px py gx gy rows) to write ground-plane tracks; None keeps pixels
 
-data_dict = {}
-
-# Read and parse the input file
-with open(input_file, "r") as file:
-    for line in file:
-        if "->" in line:
-            key, values = line.split("->")
-            key = key.strip()
-            values = eval(values.strip())
-            if key not in data_dict:
-                data_dict[key] = []
-            data_dict[key].extend(values)
+def clean_file(input_file, output_file, min_length=min_length, drop_stationary=drop_stationary, max_step=max_step,
+               merge_window=merge_window, workers=workers, follow_input=follow_input, homography_file=homography_file):
+    """Cleans a detection file into output_file and returns the number of tracks written."""
+    with open(input_file, "r") as file:
+        lines = follow(input_file) if follow_input else file
+        tracks = clean(
+            lines, min_length=min_length, drop_stationary=drop_stationary,
+            max_step=max_step, merge_window=merge_window, workers=workers,
+        )
+        if homography_file is not None:
+            tracks = calibrate(tracks, load_homography(homography_file))
+        return write_tracks(tracks, output_file)
 
-# Write the cleaned data to the output file, ignoring entries with fewer than 20 values
-with open(output_file, "w") as file:
-    for key, values in data_dict.items():
-        if len(values) >= 10:  # Only include entries with 20 or more values
-            file.write(f"{key} -> {values}\n")
+if __name__ == "__main__":
+    count = clean_file(input_file, output_file)
+    print(f"{count} cleaned tracks saved to {output_file}")
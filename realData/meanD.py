@@ -1,3 +1,5 @@
+import ast
+
 # Function to calculate the mean length of values associated with each key
 def calculate_mean_length(data_file):
     lengths = []
@@ -5,7 +7,7 @@ def calculate_mean_length(data_file):
         for line in file:
             if "->" in line:
                 key, values = line.split("->")
-                values = eval(values.strip())
+                values = ast.literal_eval(values.strip())
                 lengths.append(len(values))
     mean_length = sum(lengths) / len(lengths) if lengths else 0
     return mean_length
@@ -0,0 +1,47 @@
+"""Checks that cleaned track files keep one label per track and load with their original classes.
+
+Run with ``python -m pytest`` from this folder, or ``python test_cleaning.py``.
+"""
+import os
+import sys
+import tempfile
+
+from cleaning import clean, write_tracks
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "simulation"))
+import trajstore  # noqa: E402
+
+
+def track_line(label, *segments):
+    """One track line made of (start x, length) segments; a new segment starts with a jump."""
+    points = [(start + i * 5, 100 + i) for start, length in segments for i in range(length)]
+    return f"{label} -> {points}\n"
+
+
+def test_repeats_get_fresh_ids_of_the_same_class():
+    lines = [track_line("car7", (0, 15), (900, 15)), track_line("person3", (0, 12)), track_line("car9", (0, 12))]
+    lines += [track_line(f"person{i}", (0, 12)) for i in range(20, 30)]
+    lines.append(track_line("person3", (400, 12)))  # Id reused beyond the merge window
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clean.txt")
+        write_tracks(clean(lines, max_step=60, merge_window=5, workers=1), path)
+        store = trajstore.load(path)
+        labels = [store.label(index) for index in range(len(store))]
+    assert sorted(store.class_names) == ["car", "person"]
+    assert len(labels) == len(set(labels)) == 15
+    assert labels[:4] == ["car7", "car8", "person3", "car9"]  # Fresh ids stay above every id seen so far
+    assert labels[-1] == "person30"
+
+
+def test_recleaning_keeps_every_track():
+    lines = [track_line("car1", (0, 15), (900, 15))] * 2
+    first = list(clean(lines, max_step=60, merge_window=None, workers=1))
+    again = list(clean((f"{label} -> {[tuple(p) for p in points.tolist()]}\n" for label, points in first),
+                       max_step=60, merge_window=None, workers=1))
+    assert [label for label, _ in again] == [label for label, _ in first]
+
+
+if __name__ == "__main__":
+    test_repeats_get_fresh_ids_of_the_same_class()
+    test_recleaning_keeps_every_track()
+    print("All checks passed")
@@ -0,0 +1,87 @@
+"""Streaming writer and tail-follower for the line-per-track trajectory format."""
+import os
+import time
+
+# Suffix of the marker file that exists while a sink is still writing
+WRITING_SUFFIX = ".writing"
+
+
+def format_track(label, trajectory):
+    """Formats a track as one ``label -> [(x, y), ...]`` line."""
+    trajectory_str = ", ".join([str(pos) if pos is not None else "None" for pos in trajectory])
+    return f"{label} -> [{trajectory_str}]\n"
+
+
+class TrackSink:
+    """Buffered append-only writer of completed tracks, one line per track.
+
+    Keeps a single open handle and writes whole lines in batches, either every
+    ``flush_every`` tracks or every ``flush_interval`` seconds. A marker file
+    exists beside the output while the sink is open so ``follow`` knows when
+    the producer is done.
+    """
+
+    def __init__(self, path, flush_every=64, flush_interval=5.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.tracks_written = 0
+        self.file = open(path, "w")
+        open(path + WRITING_SUFFIX, "w").close()
+        self.last_flush = time.monotonic()
+
+    def write(self, label, trajectory):
+        """Queues one completed track (or a fragment of a long one)."""
+        if not trajectory:
+            return
+        self.buffer.append(format_track(label, trajectory))
+        self.tracks_written += 1
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """Flushes when enough tracks are queued or the flush interval has passed."""
+        if len(self.buffer) >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Writes every queued line in one call so readers only ever see whole lines."""
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer.clear()
+            self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        if os.path.exists(self.path + WRITING_SUFFIX):
+            os.remove(self.path + WRITING_SUFFIX)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def follow(path, poll_interval=0.5):
+    """Yields complete lines of a file as a sink appends them, like ``tail -f``.
+
+    Stops once the sink has closed and every line has been read.
+    """
+    with open(path, "r") as file:
+        partial = ""
+        while True:
+            chunk = file.readline()
+            if chunk:
+                partial += chunk
+                if partial.endswith("\n"):
+                    yield partial
+                    partial = ""
+                continue
+            if not os.path.exists(path + WRITING_SUFFIX):
+                # The sink flushes before removing its marker, so the rest is final
+                yield from (partial + file.read()).splitlines(keepends=True)
+                break
+            time.sleep(poll_interval)
@@ -0,0 +1,221 @@
+"""Headless accuracy and latency benchmark of the trajectory predictors.
+
+Runs every engine over held-out test trajectories of the simulated and the
+real datasets, for several library sizes, and writes one JSON record per
+(dataset, engine, library size) with ADE/FDE, per-frame latency percentiles,
+throughput and peak memory. Engines with ``predict_distribution`` are also
+scored on their top-k hypotheses (best-of-k ADE) and on exit accuracy.
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import trajstore
+from flowfield import FlowFieldPredictor
+from matcher import PrefixMatchPredictor
+from noise import UniformNoise, apply_models
+from online import Predictor
+from roundabout import generate_trajectories
+from routes import RouteIndex, exit_labels
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "realData"))
+from calibration import SceneGrid  # Scene occupancy and flow grid, shared with the real-data scripts
+
+# Parameters
+prediction_horizon = 50  # Number of points to predict
+num_tests = 50  # Held-out trajectories per dataset
+library_sizes = [1000, 5000, 10000]
+top_k = 10  # Hypotheses scored for engines that predict a distribution
+
+
+# Engine factories take the library, its units per simulation unit and the trajectories to leave out of matching;
+# the same names select the engine of ``learnmovement predict``, ``bench`` and ``live``
+def make_position(store, scale, exclude=()):
+    """predictor.py-style matching by position at each step, with exit labels for its distributions."""
+    return Predictor(
+        store, 2.0 * scale, 3.0 * scale, cell_size=1.0 * scale, exits=exit_labels(store, seed=0), noise_sigma=0.1 * scale,
+        exclude=exclude,
+    )
+
+
+def make_position_scene(store, scale, exclude=()):
+    """Position matching whose hypotheses must stay in cells the library visited twice, moving with the flow."""
+    points = np.asarray(store.points, dtype=np.float64)
+    tracks = ((None, store[index]) for index in range(len(store)))
+    grid = SceneGrid.build(tracks, cell_size=1.0 * scale, bounds=(*points.min(axis=0), *points.max(axis=0)))
+    return Predictor(
+        store, 2.0 * scale, 3.0 * scale, cell_size=1.0 * scale, exits=exit_labels(store, seed=0), noise_sigma=0.1 * scale,
+        plausible=functools.partial(grid.plausible, min_count=2, min_alignment=0.0), exclude=exclude,
+    )
+
+
+def make_prefix(store, scale, exclude=()):
+    """predictorV0.py-style matching by prefix mean squared error."""
+    return PrefixMatchPredictor(store, exclude=exclude)
+
+
+def make_prefix_routes(store, scale, exclude=()):
+    """Prefix matching restricted to the routes the prefix may belong to."""
+    route_index = RouteIndex.build(store, spacing=0.5 * scale, seed=0)
+    return PrefixMatchPredictor(store, route_index=route_index, route_tolerance=1.0 * scale ** 2, exclude=exclude)
+
+
+def make_flowfield(store, scale, exclude=()):
+    """Grid Markov rollout, whose per-step cost does not depend on the library size."""
+    return FlowFieldPredictor(store, cell_size=1.0 * scale, exclude=exclude)
+
+
+engines = {
+    "position": make_position,
+    "position_scene": make_position_scene,
+    "prefix": make_prefix,
+    "prefix_routes": make_prefix_routes,
+    "flowfield": make_flowfield,
+}
+
+
+def synthetic_store(path, num_objects=10000, seed=0):
+    """Generates a noisy simulated dataset like sim.py followed by noiseSim.py."""
+    points, offsets, speeds, _, _ = generate_trajectories(num_objects, seed=seed)
+    points, offsets = apply_models(points, offsets, [UniformNoise(0.1)], np.random.default_rng(seed))
+    trajstore.write_store(path, points, offsets, speeds=speeds)
+    return trajstore.load(path)
+
+
+def split_store(store, num_tests, library_size, path):
+    """Writes the first library_size trajectories to their own store; the last num_tests are held out."""
+    library_size = min(library_size, len(store) - num_tests)
+    offsets = store.offsets[:library_size + 1]
+    trajstore.write_store(
+        path, store.points[:offsets[-1]], offsets, ids=store.ids[:library_size],
+        classes=store.classes[:library_size], speeds=store.speeds[:library_size], class_names=store.class_names,
+    )
+    tests = [np.asarray(store[index], dtype=np.float64) for index in range(len(store) - num_tests, len(store))]
+    return trajstore.load(path), tests
+
+
+def nearest_exits(library, exits, tests):
+    """Exit of every test trajectory: the library exit whose mean end point is closest to its last point."""
+    ends = np.asarray(library.points[library.offsets[1:] - 1], dtype=np.float64)
+    centers = np.array([ends[exits == label].mean(axis=0) for label in range(exits.max() + 1)])
+    last = np.array([trajectory[-1] for trajectory in tests])
+    return np.argmin(((last[:, None] - centers) ** 2).sum(axis=2), axis=1)
+
+
+def evaluate(engine, tests, horizon, test_exits=None, k=top_k):
+    """Replays each test trajectory through the engine frame by frame.
+
+    Only frames whose true future covers the whole horizon are scored, and a
+    prediction shorter than the horizon counts as a miss, so ADE and FDE are
+    always taken over exactly ``horizon`` steps.
+    """
+    latencies, displacement_errors, final_errors = [], [], []
+    scored = missed = 0
+    best_of_k, exits_correct = [], []
+    distributions = hasattr(engine, "predict_distribution")
+    for track_id, trajectory in enumerate(tests):
+        for frame_idx in range(len(trajectory) - 1):
+            start = time.perf_counter()
+            engine.update(track_id, trajectory[frame_idx])
+            predicted = engine.predict(track_id, horizon)
+            engine.end_frame()
+            latencies.append(time.perf_counter() - start)
+
+            truth = trajectory[frame_idx + 1:frame_idx + 1 + horizon]
+            if len(truth) < horizon:
+                continue
+            scored += 1
+            if distributions:
+                distribution = engine.predict_distribution(track_id, horizon, k=k)
+                if distribution is not None and distribution.futures.shape[1] == horizon:
+                    complete = distribution.futures[~np.isnan(distribution.futures[:, -1, 0])]
+                    best_of_k.append(np.hypot(*(complete - truth).transpose(2, 0, 1)).mean(axis=1).min())
+                if distribution is not None and test_exits is not None:
+                    exits_correct.append(np.argmax(distribution.exit_probabilities) == test_exits[track_id])
+            if len(predicted) < horizon:
+                missed += 1
+                continue
+            errors = np.hypot(*(np.asarray(predicted[:horizon], dtype=np.float64) - truth).T)
+            displacement_errors.append(errors.mean())
+            final_errors.append(errors[-1])
+
+    latencies = np.array(latencies)
+    return {
+        "frames": len(latencies),
+        "scored_frames": scored,
+        "ade": float(np.mean(displacement_errors)) if displacement_errors else None,
+        "fde": float(np.mean(final_errors)) if final_errors else None,
+        "miss_rate": missed / max(scored, 1),
+        "best_of_k_ade": float(np.mean(best_of_k)) if best_of_k else None,
+        "exit_accuracy": float(np.mean(exits_correct)) if exits_correct else None,
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "frames_per_second": float(len(latencies) / latencies.sum()),
+    }
+
+
+def run(datasets, engine_names, sizes, num_tests, horizon, work_dir):
+    """Benchmarks every engine on every dataset and library size."""
+    results = []
+    for dataset, (store, scale) in datasets.items():
+        # Sizes beyond the store are capped to the same library; run it once
+        for size in sorted({min(size, len(store) - num_tests) for size in sizes}):
+            library, tests = split_store(store, num_tests, size, os.path.join(work_dir, f"{dataset}_{size}.traj"))
+            for name in engine_names:
+                # Peak memory is measured while building, where the library structures are allocated
+                tracemalloc.start()
+                start = time.perf_counter()
+                engine = engines[name](library, scale)
+                build_seconds = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                result = {"dataset": dataset, "engine": name, "library_size": len(library),
+                          "test_trajectories": len(tests), "horizon": horizon,
+                          "build_seconds": build_seconds, "peak_memory_mb": peak / 2 ** 20}
+                exits = getattr(engine, "exits", None)
+                test_exits = None if exits is None else nearest_exits(library, exits, tests)
+                result.update(evaluate(engine, tests, horizon, test_exits))
+                results.append(result)
+                print(f"{dataset:>4} {name:>14} N={len(library):>6} ADE={result['ade']} "
+                      f"p50={result['latency_p50_ms']:.3f}ms p99={result['latency_p99_ms']:.3f}ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark trajectory predictors headlessly.")
+    parser.add_argument("--sim", default="data_with_noise.traj", help="Simulated store or text file; generated if missing")
+    parser.add_argument("--real", default=os.path.join("..", "realData", "dataClean.txt"), help="Real store or text file")
+    parser.add_argument("--real-scale", type=float, default=20.0, help="Pixels per simulation unit for real-data thresholds")
+    parser.add_argument("--engines", nargs="+", default=list(engines), choices=list(engines))
+    parser.add_argument("--library-sizes", nargs="+", type=int, default=library_sizes)
+    parser.add_argument("--num-tests", type=int, default=num_tests)
+    parser.add_argument("--horizon", type=int, default=prediction_horizon)
+    parser.add_argument("-o", "--output", default="bench.json")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if os.path.exists(args.sim):
+            sim_store = trajstore.load(args.sim)
+        else:
+            sim_store = synthetic_store(os.path.join(work_dir, "sim.traj"))
+        datasets = {"sim": (sim_store, 1.0)}
+        if os.path.exists(args.real):
+            datasets["real"] = (trajstore.load(args.real), args.real_scale)
+
+        results = run(datasets, args.engines, args.library_sizes, args.num_tests, args.horizon, work_dir)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Flow-field prediction: a grid Markov model of the scene whose rollout cost ignores library size."""
+import math
+from collections import deque
+
+import numpy as np
+
+
+class FlowField:
+    """Most likely next step for every (grid cell, heading bin) state, learned from a trajectory library.
+
+    Transitions between heading bins are counted per cell in one pass over
+    every step of the library; each state keeps the mean displacement of its
+    most frequent outgoing heading. Only states that occur are stored, so a
+    fine grid over a large image costs memory in proportion to the road
+    actually driven, not to the number of cells. Taking the mode rather than the mean
+    of all outgoing steps keeps vehicles that leave and vehicles that stay on
+    the roundabout from being averaged into a path nobody drives.
+    """
+
+    def __init__(self, points, offsets, cell_size=1.0, heading_bins=16, include=None):
+        points = np.asarray(points, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        self.cell_size = cell_size
+        self.heading_bins = heading_bins
+        self.origin = points.min(axis=0)
+        self.shape = np.floor((points.max(axis=0) - self.origin) / cell_size).astype(np.int64) + 1
+
+        # Point i is a sample when i - 1 and i + 1 belong to its trajectory: heading in, cell, heading out
+        owner = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        position = np.arange(len(points)) - offsets[owner]
+        sample = (position >= 1) & (position < np.diff(offsets)[owner] - 1)
+        if include is not None:
+            sample &= np.asarray(include, dtype=bool)[owner]
+        index = np.flatnonzero(sample)
+        incoming, outgoing = points[index] - points[index - 1], points[index + 1] - points[index]
+        moving = np.any(incoming != 0, axis=1) & np.any(outgoing != 0, axis=1)
+        index, incoming, outgoing = index[moving], incoming[moving], outgoing[moving]
+        cells, heading_out = self.cells(points[index]), self.headings(outgoing)
+        states = cells * heading_bins + self.headings(incoming)
+
+        # Step of every seen (cell, heading in) state, and per cell, ignoring the incoming heading, for a first
+        # point or an unseen heading
+        self.steps = self._modes(states * heading_bins + heading_out, outgoing, heading_bins)
+        self.cell_steps = self._modes(cells * heading_bins + heading_out, outgoing, heading_bins)
+
+    @classmethod
+    def from_store(cls, store, cell_size=1.0, heading_bins=16, exclude=()):
+        include = np.ones(len(store), dtype=bool)
+        include[list(exclude)] = False
+        return cls(store.points, store.offsets, cell_size, heading_bins, include)
+
+    @staticmethod
+    def _modes(transitions, outgoing, heading_bins):
+        """Maps every seen state to the mean displacement of its most frequent outgoing heading.
+
+        ``transitions`` is ``state * heading_bins + heading out`` per sample;
+        ties go to the lowest heading.
+        """
+        keys, inverse, counts = np.unique(transitions, return_inverse=True, return_counts=True)
+        sums = np.stack([np.bincount(inverse, weights=outgoing[:, axis], minlength=len(keys)) for axis in range(2)], axis=-1)
+        states = keys // heading_bins
+
+        # Keys are sorted, so each state's transitions are contiguous; order them by count, stably
+        order = np.lexsort((-counts, states))
+        first = order[np.concatenate(([True], states[order][1:] != states[order][:-1]))]
+        steps = (sums[first] / counts[first][:, None]).astype(np.float32)
+        return dict(zip(states[first].tolist(), steps.tolist()))
+
+    def cells(self, points):
+        """Flat cell index of every point, -1 outside the learned area."""
+        cell = np.floor((np.asarray(points, dtype=np.float64) - self.origin) / self.cell_size).astype(np.int64)
+        inside = np.all((cell >= 0) & (cell < self.shape), axis=-1)
+        return np.where(inside, cell[..., 1] * self.shape[0] + cell[..., 0], -1)
+
+    def headings(self, moves):
+        """Heading bin of every displacement."""
+        angles = np.arctan2(moves[..., 1], moves[..., 0])
+        return np.floor((angles + np.pi) / (2 * np.pi) * self.heading_bins).astype(np.int64) % self.heading_bins
+
+    def rollout(self, position, last_step, horizon, speed=None):
+        """Follows the table for horizon steps from a position, one lookup per step.
+
+        ``last_step`` (None for a first sighting) gives the heading; where the
+        table knows nothing the object keeps its last step. With ``speed``
+        every step is rescaled to the object's own speed.
+        """
+        # Plain floats: per-step numpy scalar calls would cost more than the lookups themselves
+        x, y = (float(value) for value in position)
+        origin_x, origin_y = (float(value) for value in self.origin)
+        cols, rows = (int(value) for value in self.shape)
+        bins_per_radian = self.heading_bins / (2 * math.pi)
+        step_x, step_y = (None, None) if last_step is None else (float(last_step[0]), float(last_step[1]))
+        path = np.empty((horizon, 2))
+        for step in range(horizon):
+            col = math.floor((x - origin_x) / self.cell_size)
+            row = math.floor((y - origin_y) / self.cell_size)
+            cell = row * cols + col if 0 <= col < cols and 0 <= row < rows else -1
+            move = None
+            if cell >= 0 and step_x is not None:
+                heading = int((math.atan2(step_y, step_x) + math.pi) * bins_per_radian) % self.heading_bins
+                move = self.steps.get(cell * self.heading_bins + heading)
+            if move is None and cell >= 0:
+                move = self.cell_steps.get(cell)
+            if move is not None:
+                step_x, step_y = float(move[0]), float(move[1])
+            elif step_x is None:
+                return path[:step]
+            length = math.hypot(step_x, step_y)
+            if speed is not None and length > 0:
+                step_x, step_y = step_x * speed / length, step_y * speed / length
+            x, y = x + step_x, y + step_y
+            path[step] = x, y
+        return path
+
+
+class FlowFieldPredictor:
+    """Online predictor over a ``FlowField`` with the update/predict/end_frame interface of ``online.Predictor``.
+
+    Only the last few points of every track are kept, so memory and per-step
+    cost do not depend on how many historical trajectories were learned.
+    """
+
+    def __init__(self, store, cell_size=1.0, heading_bins=16, speed_window=5, max_age=30, exclude=()):
+        self.field = FlowField.from_store(store, cell_size, heading_bins, exclude)
+        self.speed_window = speed_window
+        self.max_age = max_age
+        self.tracks = {}  # track_id -> (recent points, last seen frame)
+        self.frame = 0
+
+    def update(self, track_id, point):
+        recent = self.tracks[track_id][0] if track_id in self.tracks else deque(maxlen=self.speed_window + 1)
+        recent.append(np.asarray(point, dtype=np.float64))
+        self.tracks[track_id] = (recent, self.frame)
+
+    def predict(self, track_id, horizon=50):
+        """Returns the next ``horizon`` points of a track rolled out through the flow field."""
+        if track_id not in self.tracks:
+            return np.empty((0, 2))
+        recent = np.array(self.tracks[track_id][0])
+        last_step, speed = None, None
+        if len(recent) > 1:
+            moves = np.diff(recent, axis=0)
+            last_step = moves[-1] if np.any(moves[-1] != 0) else None
+            speed = np.hypot(*moves.T).mean()  # Own speed, averaged to smooth detection noise
+        return self.field.rollout(recent[-1], last_step, horizon, speed)
+
+    def end_frame(self):
+        """Expires lost tracks and returns their ids."""
+        lost_ids = [track_id for track_id, (_, last_seen) in self.tracks.items() if self.frame - last_seen > self.max_age]
+        for track_id in lost_ids:
+            del self.tracks[track_id]
+        self.frame += 1
+        return lost_ids
@@ -0,0 +1,127 @@
+"""Headless prediction runs: replay test trajectories through an engine and emit predictions.
+
+Prediction is a generator of ``(frame_idx, observations, predictions)``
+tuples. Outputs (an array file, a JSON-lines stream, a video) are consumers
+of that generator, so nothing is drawn or encoded unless it is asked for.
+"""
+import argparse
+import json
+import sys
+
+import numpy as np
+
+import instrument
+import trajstore
+
+
+def replay(engine, trajectories, test_ids, num_frames, horizon):
+    """Feeds the test trajectories to the engine as live tracks and yields every frame's predictions."""
+    for frame_idx in range(num_frames):
+        observations = {}
+        with instrument.span("predict.update"):
+            for track_id in test_ids:
+                test_trajectory = trajectories[track_id]
+                if frame_idx < len(test_trajectory):
+                    observations[track_id] = test_trajectory[frame_idx]
+                    engine.update(track_id, test_trajectory[frame_idx])
+        with instrument.span("predict.predict"):
+            predictions = {track_id: engine.predict(track_id, horizon) for track_id in test_ids}
+        with instrument.span("predict.end_frame"):
+            engine.end_frame()
+        yield frame_idx, observations, predictions
+
+
+def collect(stream, test_ids, num_frames, horizon):
+    """Gathers a stream into a (frames, tracks, horizon, 2) array, NaN where nothing was predicted."""
+    predicted = np.full((num_frames, len(test_ids), horizon, 2), np.nan, dtype=np.float32)
+    column = {track_id: position for position, track_id in enumerate(test_ids)}
+    for frame_idx, _, predictions in stream:
+        for track_id, points in predictions.items():
+            predicted[frame_idx, column[track_id], :len(points)] = points
+    return predicted
+
+
+def summarize(predicted, trajectories, test_ids):
+    """Counts predicted frames and scores complete predictions against each test trajectory's true future."""
+    num_frames, _, horizon, _ = predicted.shape
+    predicted_frames, errors = 0, []
+    for column, track_id in enumerate(test_ids):
+        trajectory = np.asarray(trajectories[track_id], dtype=np.float64)
+        for frame_idx in range(min(num_frames, len(trajectory))):
+            points = predicted[frame_idx, column]
+            predicted_frames += not np.isnan(points[0, 0])
+            truth = trajectory[frame_idx + 1:frame_idx + 1 + horizon]
+            if len(truth) == horizon and not np.isnan(points[-1, 0]):
+                errors.append(np.hypot(*(points - truth).T).mean())
+    return {
+        "frames": num_frames, "tracks": len(test_ids), "predicted_frames": predicted_frames,
+        "scored_frames": len(errors), "ade": float(np.mean(errors)) if errors else None,
+    }
+
+
+def write_jsonl(stream, file):
+    """Writes one JSON line of predictions per frame as the stream produces them."""
+    for frame_idx, _, predictions in stream:
+        with instrument.span("output.write"):
+            record = {"frame": frame_idx, "predictions": {str(k): np.asarray(v).tolist() for k, v in predictions.items()}}
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+
+
+def main(make_engine, argv=None, data="data_with_noise.traj", test_ids=(0,), num_frames=200, horizon=50, video=None,
+         prog=None):
+    """Command line shared by the predictor scripts; make_engine(trajectories, test_ids) builds the engine."""
+    parser = argparse.ArgumentParser(prog=prog, description="Replay test trajectories through a predictor.")
+    parser.add_argument("--data", default=data, help="Trajectory store (or legacy text file)")
+    parser.add_argument("--test-ids", nargs="+", type=int, default=list(test_ids), help="Library trajectories replayed as live tracks")
+    parser.add_argument("--frames", type=int, default=num_frames)
+    parser.add_argument("--horizon", type=int, default=horizon)
+    parser.add_argument("--output", default=None, help="Save predictions as a .npy array")
+    parser.add_argument("--stream", action="store_true", help="Write predictions to stdout as JSON lines instead of a summary")
+    parser.add_argument("--video", nargs="?", const=video, default=None, help=f"Also render a video (default name: {video})")
+    parser.add_argument("--render-every", type=int, default=1, help="Render only every Nth frame")
+    parser.add_argument("--render-start", type=int, default=0, help="First frame to render")
+    parser.add_argument("--render-stop", type=int, default=None, help="Frame to stop rendering at")
+    parser.add_argument("--profile", default=None, help="Write per-stage timings and counters to this .json or .csv report")
+    parser.add_argument("--cprofile", default=None, help="Also dump cProfile stats to this file")
+    args = parser.parse_args(argv)
+
+    instrument.enable(args.profile is not None)
+    with instrument.profile(args.cprofile):
+        run(make_engine, args)
+    if args.profile:
+        instrument.write_report(args.profile)
+        print(f"Timing report saved to {args.profile}")
+
+
+def run(make_engine, args):
+    """Loads the data, builds the engine and drives the stream into the requested outputs."""
+    with instrument.span("load"):
+        trajectories = trajstore.load(args.data)
+    with instrument.span("build"):
+        engine = make_engine(trajectories, args.test_ids)
+    stream = replay(engine, trajectories, args.test_ids, args.frames, args.horizon)
+
+    video_stream = None
+    if args.video:
+        from render import FrameRenderer, render_stream
+
+        renderer = FrameRenderer()
+        video_stream = renderer.video(args.video, fps=30)
+        stream = render_stream(stream, video_stream, args.render_every, args.render_start, args.render_stop, renderer)
+
+    try:
+        if args.stream:
+            write_jsonl(stream, sys.stdout)
+        else:
+            predicted = collect(stream, args.test_ids, args.frames, args.horizon)
+            if args.output:
+                np.save(args.output, predicted)
+                print(f"Predictions {predicted.shape} saved to {args.output}")
+            summary = summarize(predicted, trajectories, args.test_ids)
+            ade = "n/a" if summary["ade"] is None else f"{summary['ade']:.3f}"
+            print(f"Tracks {summary['tracks']}, frames {summary['frames']}: {summary['predicted_frames']} predictions, "
+                  f"ADE {ade} over {summary['scored_frames']} complete {args.horizon}-step horizons")
+    finally:
+        if video_stream is not None:
+            video_stream.close()
@@ -0,0 +1,150 @@
+"""Named timing spans and counters for the pipeline, costing next to nothing while disabled.
+
+Wrap a stage in ``with instrument.span("name"):`` and record values with
+``instrument.count("name", value)``. Nothing is recorded until ``enable()``;
+``write_report`` then exports per-name statistics and histograms as JSON or
+CSV, and ``profile`` optionally wraps a run in cProfile.
+"""
+import cProfile
+import csv
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+enabled = False
+spans = defaultdict(list)  # name -> durations in seconds
+counters = defaultdict(list)  # name -> recorded values
+
+# Span histogram edges: 1 us to 10 s, four buckets per decade
+span_edges = np.logspace(-6, 1, 29)
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        spans[self.name].append(time.perf_counter() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_null_span = _NullSpan()
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def reset():
+    spans.clear()
+    counters.clear()
+
+
+def span(name):
+    """Context manager timing one occurrence of a named stage."""
+    return _Span(name) if enabled else _null_span
+
+
+def count(name, value=1):
+    """Records one value of a named counter."""
+    if enabled:
+        counters[name].append(value)
+
+
+def timed(name):
+    """Decorator timing every call of a function as a span."""
+    def decorate(function):
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with _Span(name):
+                return function(*args, **kwargs)
+        wrapper.__name__, wrapper.__doc__ = function.__name__, function.__doc__
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    """Raw recorded samples, e.g. to send back from a worker process."""
+    return {"spans": dict(spans), "counters": dict(counters)}
+
+
+def merge(samples):
+    """Adds samples from ``snapshot`` (of another process) to this one."""
+    for name, values in samples["spans"].items():
+        spans[name].extend(values)
+    for name, values in samples["counters"].items():
+        counters[name].extend(values)
+
+
+def _statistics(values, edges):
+    values = np.asarray(values, dtype=np.float64)
+    if edges is None:
+        edges = np.histogram_bin_edges(values, bins=10)
+    histogram, edges = np.histogram(np.clip(values, edges[0], edges[-1]), bins=edges)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": len(values), "total": float(values.sum()), "mean": float(values.mean()),
+        "p50": float(p50), "p90": float(p90), "p99": float(p99), "max": float(values.max()),
+        "histogram": {"edges": edges.tolist(), "counts": histogram.tolist()},
+    }
+
+
+def summary():
+    """Per-name statistics and histograms of every span (seconds) and counter."""
+    return {
+        "spans": {name: _statistics(values, span_edges) for name, values in sorted(spans.items()) if values},
+        "counters": {name: _statistics(values, None) for name, values in sorted(counters.items()) if values},
+    }
+
+
+def write_report(path):
+    """Writes the summary as JSON, or as CSV when the path ends in .csv."""
+    report = summary()
+    if not path.endswith(".csv"):
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+        return
+    columns = ["count", "total", "mean", "p50", "p90", "p99", "max"]
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["kind", "name"] + columns + ["histogram"])
+        for kind in ("spans", "counters"):
+            for name, stats in report[kind].items():
+                histogram = stats["histogram"]
+                buckets = ";".join(f"{edge:.3g}:{n}" for edge, n in zip(histogram["edges"][1:], histogram["counts"]) if n)
+                writer.writerow([kind[:-1], name] + [stats[column] for column in columns] + [buckets])
+
+
+@contextmanager
+def profile(path=None):
+    """Runs the block under cProfile and dumps the stats to path; does nothing when path is None."""
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,349 @@
+"""Live ingestion service: ``track_id, t, x, y`` lines in, one line of predictions per frame out.
+
+Every connection (or stdin) gets its own predictor. The input is read
+eagerly into a deque of complete frames, each stamped when it arrives, so
+a backlog is visible to the service instead of hiding in socket buffers.
+A frame that waited longer than the deadline, or that has more than
+``queue_size`` newer frames behind it, is still fed to the predictor so its
+tracks stay consistent, but its prediction is skipped and reported as
+dropped: the service catches up instead of falling behind. Only a backlog
+beyond ``backlog_limit`` frames pauses reading, as a last resort.
+
+``replay`` streams a dataset at a configurable frame rate and reports
+sustained throughput and tail latency as seen by the client.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import instrument
+import trajstore
+from bench import engines
+
+# Parameters
+host, port = "127.0.0.1", 8765
+data_file = "data_with_noise.traj"  # Library served and trajectories replayed, so both sides share its units
+queue_size = 8  # Newer frames a frame may have waiting behind it before its prediction is skipped
+deadline = 0.1  # Seconds a frame may wait before its prediction is skipped
+backlog_limit = 4096  # Frames read ahead before reading pauses and TCP flow control takes over
+prediction_horizon = 50  # Number of points to predict
+replay_fps = 30.0  # Frame rate of the replay client; 0 sends as fast as the service accepts
+concurrent_tracks = 20  # Tracks the replay client keeps in the scene at once
+socket_buffer = 64 * 1024  # Kernel buffer per socket; data waiting there has no arrival stamp yet
+
+
+def parse_update(line):
+    """Parses ``track_id, t, x, y`` (commas or spaces) into (track_id, t, point)."""
+    fields = line.replace(",", " ").split()
+    return fields[0], int(fields[1]), (float(fields[2]), float(fields[3]))
+
+
+class FrameBuffer:
+    """Deque of complete frames between the reader and the predictor, with wake-ups for both sides."""
+
+    def __init__(self, limit=backlog_limit):
+        self.frames = deque()
+        self.limit = limit
+        self.ready = asyncio.Event()  # Set while frames are waiting
+        self.space = asyncio.Event()  # Set while the backlog is under its limit
+        self.space.set()
+
+    async def put(self, frame):
+        """Appends a frame; waits only while the backlog is at its limit."""
+        await self.space.wait()
+        self.frames.append(frame)
+        self.ready.set()
+        if len(self.frames) >= self.limit:
+            self.space.clear()
+
+    async def wait(self):
+        """Waits until at least one frame (or the end of stream) is buffered."""
+        while not self.frames:
+            self.ready.clear()
+            await self.ready.wait()
+
+    def popleft(self):
+        frame = self.frames.popleft()
+        if len(self.frames) < self.limit:
+            self.space.set()
+        return frame
+
+
+async def read_frames(reader, frames):
+    """Reads the stream eagerly and buffers its frames; a blank line or a new t closes a frame.
+
+    Each frame is stamped when its first line arrives, so its age measures
+    how long it has waited for the predictor.
+    """
+    t, updates, arrived = None, [], None
+    async for raw in reader:
+        line = raw.decode().strip()
+        if not line:
+            if updates:
+                await frames.put((t, updates, arrived))
+                updates = []
+            continue
+        try:
+            track_id, frame_t, point = parse_update(line)
+        except (ValueError, IndexError):
+            instrument.count("live.malformed")
+            continue
+        if updates and frame_t != t:
+            await frames.put((t, updates, arrived))
+            updates = []
+        if not updates:
+            arrived = time.perf_counter()
+        t = frame_t
+        updates.append((track_id, point))
+    if updates:
+        await frames.put((t, updates, arrived))
+    await frames.put(None)  # End of stream
+
+
+def step(engine, updates, horizon, predict=True):
+    """Feeds one frame to the engine and, unless skipped, predicts every track it updated."""
+    for track_id, point in updates:
+        engine.update(track_id, point)
+    predictions = {track_id: engine.predict(track_id, horizon) for track_id, _ in updates} if predict else None
+    engine.end_frame()
+    return predictions
+
+
+def catch_up(engine, frames):
+    """Feeds skipped frames to the engine in order without predicting."""
+    for updates in frames:
+        step(engine, updates, 0, predict=False)
+
+
+async def serve_frames(engine, frames, write, horizon, deadline, queue_size):
+    """Runs buffered frames through the engine in order, writing one JSON line per frame.
+
+    Frames that are too old, or too far behind the newest one, are applied
+    together in one catch-up call and answered as dropped. The newest frame
+    is never skipped: when the sender pauses it is predicted, late.
+    """
+    loop = asyncio.get_running_loop()
+    stats = {"frames": 0, "dropped": 0, "late": 0}
+    while True:
+        await frames.wait()
+        now = time.perf_counter()
+        skipped = []
+        # Only frames with a newer one behind them are skipped; None (end of stream) is always last
+        while len(frames.frames) > 1 and frames.frames[1] is not None and (
+                len(frames.frames) > queue_size + 1 or now - frames.frames[0][2] > deadline):
+            skipped.append(frames.popleft())
+        instrument.count("live.backlog", len(frames.frames))
+        if skipped:
+            # Answered as soon as they are skipped; their updates are applied afterwards
+            stats["frames"] += len(skipped)
+            stats["dropped"] += len(skipped)
+            await write("".join(
+                json.dumps({"t": t, "latency_ms": round((now - arrived) * 1000, 3), "dropped": True}) + "\n"
+                for t, _, arrived in skipped
+            ))
+            with instrument.span("live.catch_up"):
+                await loop.run_in_executor(None, catch_up, engine, [updates for _, updates, _ in skipped])
+            continue
+
+        frame = frames.popleft()
+        if frame is None:  # End of stream
+            return stats
+        t, updates, arrived = frame
+        with instrument.span("live.step"):
+            predictions = await loop.run_in_executor(None, step, engine, updates, horizon)
+        latency = time.perf_counter() - arrived
+        stats["frames"] += 1
+        stats["late"] += latency > deadline
+        record = {"t": t, "latency_ms": round(latency * 1000, 3), "predictions": {
+            str(track_id): np.round(np.asarray(points, dtype=np.float64), 3).tolist()
+            for track_id, points in predictions.items()
+        }}
+        await write(json.dumps(record) + "\n")
+
+
+async def handle(reader, write, engine, queue_size=queue_size, horizon=prediction_horizon, deadline=deadline):
+    """Serves one input stream with its own engine, reading ahead while the engine works."""
+    frames = FrameBuffer()
+    reading = asyncio.create_task(read_frames(reader, frames))
+    try:
+        stats = await serve_frames(engine, frames, write, horizon, deadline, queue_size)
+    except BaseException:
+        reading.cancel()  # Stop reading a stream nobody serves any more
+        raise
+    await reading
+    return stats
+
+
+async def serve(make_engine, host=host, port=port, **options):
+    """Accepts connections until cancelled, each one an independent track stream.
+
+    Building an engine can take longer than many frames, so one is always
+    built ahead and handed to the next connection.
+    """
+    loop = asyncio.get_running_loop()
+    spare = loop.run_in_executor(None, make_engine)
+
+    async def on_connection(reader, writer):
+        nonlocal spare
+        engine, spare = await spare, loop.run_in_executor(None, make_engine)
+        writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, socket_buffer)
+
+        async def write(text):
+            writer.write(text.encode())
+            await writer.drain()
+
+        peer = writer.get_extra_info("peername")
+        try:
+            stats = await handle(reader, write, engine, **options)
+            print(f"{peer}: {stats}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_connection, host, port)
+    print(f"Serving predictions on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def serve_stdin(make_engine, **options):
+    """Serves a single stream read from stdin, writing predictions to stdout.
+
+    A thread reads stdin (a pipe or a plain file) into a bounded line queue,
+    blocking while it is full, so stdin gets the same backpressure as a socket.
+    """
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue(maxsize=1024)
+
+    def pump():
+        for line in sys.stdin.buffer:
+            asyncio.run_coroutine_threadsafe(lines.put(line), loop).result()
+        asyncio.run_coroutine_threadsafe(lines.put(None), loop).result()
+
+    async def reader():
+        while (line := await lines.get()) is not None:
+            yield line
+
+    threading.Thread(target=pump, daemon=True).start()
+
+    async def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    engine = await loop.run_in_executor(None, make_engine)
+    stats = await handle(reader(), write, engine, **options)
+    print(stats, file=sys.stderr)
+
+
+async def collect(reader, sent):
+    """Reads the service's responses, measuring each frame's round trip from when it was sent."""
+    latencies, dropped = [], 0
+    async for line in reader:
+        record = json.loads(line)
+        latencies.append(time.perf_counter() - sent.pop(record["t"]))
+        dropped += record.get("dropped", False)
+    return latencies, dropped
+
+
+async def replay(store, host=host, port=port, fps=replay_fps, concurrent=concurrent_tracks, limit=None):
+    """Streams a store's trajectories as a live scene of up to ``concurrent`` objects and summarizes the run."""
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 24)  # A frame's predictions are one line
+    writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, socket_buffer)
+    sent = {}  # t -> send time of frames not answered yet
+    responses = asyncio.create_task(collect(reader, sent))
+
+    waiting = iter(range(len(store) if limit is None else min(limit, len(store))))
+    active = {}  # store index -> next step
+    t, start = 0, time.perf_counter()
+    while True:
+        # Objects leaving the scene are replaced by the next trajectories
+        while len(active) < concurrent and (index := next(waiting, None)) is not None:
+            active[index] = 0
+        if not active:
+            break
+        lines = []
+        for index, position in list(active.items()):
+            x, y = store[index][position]
+            lines.append(f"{index}, {t}, {x:.3f}, {y:.3f}\n")
+            if position + 1 < len(store[index]):
+                active[index] = position + 1
+            else:
+                del active[index]
+        sent[t] = time.perf_counter()
+        writer.write(("".join(lines) + "\n").encode())
+        await writer.drain()
+        t += 1
+        if fps:
+            await asyncio.sleep(max(0.0, start + t / fps - time.perf_counter()))
+
+    writer.write_eof()
+    latencies, dropped = await responses
+    elapsed = time.perf_counter() - start
+    writer.close()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "frames": t, "responses": len(latencies), "dropped": dropped,
+        "frames_per_second": len(latencies) / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "latency_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        "latency_max_ms": float(latencies.max()) if len(latencies) else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live prediction service and its replay client.")
+    modes = parser.add_subparsers(dest="mode", required=True)
+
+    server = modes.add_parser("serve", help="Serve predictions for live track updates")
+    server.add_argument("--data", default=data_file, help="Library store or text file")
+    server.add_argument("--engine", choices=list(engines), default="position")
+    server.add_argument("--scale", type=float, default=1.0, help="Units per simulation unit, e.g. 20 for pixel tracks")
+    server.add_argument("--host", default=host)
+    server.add_argument("--port", type=int, default=port)
+    server.add_argument("--stdin", action="store_true", help="Read one stream from stdin instead of a socket")
+    server.add_argument("--queue-size", type=int, default=queue_size)
+    server.add_argument("--deadline-ms", type=float, default=deadline * 1000)
+    server.add_argument("--horizon", type=int, default=prediction_horizon)
+
+    client = modes.add_parser("replay", help="Stream a dataset to a running service and measure it")
+    client.add_argument("--data", default=data_file, help="Store or text file, in the units the service was started for")
+    client.add_argument("--host", default=host)
+    client.add_argument("--port", type=int, default=port)
+    client.add_argument("--fps", type=float, default=replay_fps, help="Frames per second; 0 for as fast as possible")
+    client.add_argument("--concurrent", type=int, default=concurrent_tracks)
+    client.add_argument("--limit", type=int, default=None, help="Replay only the first N trajectories")
+    client.add_argument("-o", "--output", default=None, help="Also save the summary as JSON")
+    args = parser.parse_args(argv)
+
+    if args.mode == "replay":
+        summary = asyncio.run(replay(trajstore.load(args.data), args.host, args.port, args.fps, args.concurrent, args.limit))
+        print(json.dumps(summary, indent=2))
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(summary, file, indent=2)
+        return
+
+    store = trajstore.load(args.data)
+
+    def make_engine():
+        return engines[args.engine](store, args.scale)
+
+    options = {"queue_size": args.queue_size, "horizon": args.horizon, "deadline": args.deadline_ms / 1000}
+    try:
+        if args.stdin:
+            asyncio.run(serve_stdin(make_engine, **options))
+        else:
+            asyncio.run(serve(make_engine, args.host, args.port, **options))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
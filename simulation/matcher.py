@@ -0,0 +1,165 @@
+"""Incremental nearest-trajectory matching over a padded library matrix."""
+import copy
+
+import numpy as np
+
+import trajstore
+
+
+class PrefixMatcher:
+    """Tracks the prefix mean squared error between one observed track and every library trajectory.
+
+    The library is held time-major as an (L, N, 2) matrix, so each new
+    observation only touches one contiguous (N, 2) slice: the squared error of
+    that step is added to a running sum instead of recomputing the whole prefix.
+    ``restrict`` limits that work to a subset of the library, e.g. the members
+    of the routes the track may be on.
+    """
+
+    def __init__(self, padded, lengths, exclude=()):
+        self.library = np.ascontiguousarray(np.swapaxes(padded, 0, 1))
+        self.lengths = np.asarray(lengths)
+        self.excluded = np.zeros(len(self.lengths), dtype=bool)
+        self.excluded[list(exclude)] = True
+        self.reset()
+
+    @classmethod
+    def from_store(cls, store, exclude=()):
+        """Builds a matcher over every trajectory of a trajectory store."""
+        padded, lengths = trajstore.pad(store.points, store.offsets)
+        return cls(padded, lengths, exclude=exclude)
+
+    def fork(self):
+        """Returns a fresh matcher for another track, sharing this one's library arrays."""
+        matcher = copy.copy(self)
+        matcher.reset()
+        return matcher
+
+    def reset(self):
+        """Forgets the observed prefix."""
+        self.squared_errors = np.zeros(len(self.lengths))
+        self.observed = []
+        self.count = 0
+        self.active = None  # Every library trajectory
+        self.updated_at = np.zeros(len(self.lengths), dtype=np.int64)  # Observations included in each sum
+
+    def observe(self, point):
+        """Adds the next observed point to every active running prefix error."""
+        step = self.count
+        point = np.asarray(point, dtype=self.library.dtype)
+        if step < len(self.library):
+            if self.active is None:
+                squared = ((self.library[step] - point) ** 2).sum(axis=1)
+                self.squared_errors += np.where(self.lengths > step, squared, 0.0)
+            else:
+                squared = ((self.library[step, self.active] - point) ** 2).sum(axis=1)
+                self.squared_errors[self.active] += np.where(self.lengths[self.active] > step, squared, 0.0)
+        self.observed.append(point)
+        self.count += 1
+        if self.active is None:
+            self.updated_at[:] = self.count
+        else:
+            self.updated_at[self.active] = self.count
+
+    def restrict(self, ids=None):
+        """Limits matching to the given library ids (None for all), catching up any stale sums."""
+        self.active = None if ids is None else np.unique(np.asarray(ids, dtype=np.int64))
+        ids = np.arange(len(self.lengths)) if self.active is None else self.active
+        stale = ids[self.updated_at[ids] != self.count]
+        if len(stale):
+            steps = min(self.count, len(self.library))
+            history = np.asarray(self.observed[:steps]).reshape(-1, 1, 2)
+            squared = ((self.library[:steps, stale] - history) ** 2).sum(axis=2)
+            within = np.arange(steps)[:, None] < self.lengths[stale]
+            self.squared_errors[stale] = np.where(within, squared, 0.0).sum(axis=0)
+            self.updated_at[stale] = self.count
+
+    def _candidate_scores(self):
+        """Ids of the active library trajectories and their prefix mean squared errors."""
+        ids = np.arange(len(self.lengths)) if self.active is None else self.active
+        overlap = np.minimum(self.count, self.lengths[ids])
+        scores = np.full(len(ids), np.inf)
+        np.divide(self.squared_errors[ids], overlap, out=scores, where=overlap > 0)
+        scores[self.excluded[ids]] = np.inf
+        return ids, scores
+
+    def scores(self):
+        """Mean squared error over the overlap of the observed prefix and each library trajectory.
+
+        Trajectories outside the active subset score infinity.
+        """
+        ids, candidate_scores = self._candidate_scores()
+        scores = np.full(len(self.lengths), np.inf)
+        scores[ids] = candidate_scores
+        return scores
+
+    def best(self, k=1):
+        """Returns the indices and scores of the k closest library trajectories, best first."""
+        ids, scores = self._candidate_scores()
+        k = min(k, len(scores))
+        if k == 0:
+            return ids[:0], scores[:0]
+        if k == 1:
+            nearest = np.array([np.argmin(scores)])
+        elif k < len(scores):
+            nearest = np.argpartition(scores, k - 1)[:k]
+        else:
+            nearest = np.arange(len(scores))
+        nearest = nearest[np.lexsort((nearest, scores[nearest]))]
+        nearest = nearest[np.isfinite(scores[nearest])]
+        return ids[nearest], scores[nearest]
+
+
+class PrefixMatchPredictor:
+    """Serves many tracks with one PrefixMatcher each, behind the same interface as ``online.Predictor``.
+
+    With a ``RouteIndex`` every track only matches against the members of the
+    routes its observed prefix may belong to. The prefix is classified from
+    running per-route distances, and the matcher is only restricted again
+    when the set of plausible routes changes.
+    """
+
+    def __init__(self, store, max_age=30, exclude=(), route_index=None, route_tolerance=1.0):
+        self.store = store
+        self.max_age = max_age
+        self.route_index = route_index
+        self.route_tolerance = route_tolerance
+        self.template = PrefixMatcher.from_store(store, exclude=exclude)
+        self.tracks = {}
+        self.route_errors = {}  # track_id -> summed squared distance of its points to every route
+        self.route_sets = {}  # track_id -> routes its matcher is restricted to
+        self.last_seen = {}
+        self.frame = 0
+
+    def update(self, track_id, point):
+        """Adds a new observation of a track."""
+        matcher = self.tracks.get(track_id)
+        if matcher is None:
+            matcher = self.tracks[track_id] = self.template.fork()
+        matcher.observe(point)
+        if self.route_index is not None:
+            errors = self.route_errors.get(track_id, 0.0) + self.route_index.point_distances(point)
+            self.route_errors[track_id] = errors
+            routes = self.route_index.select(errors / matcher.count, self.route_tolerance)
+            if routes != self.route_sets.get(track_id):
+                self.route_sets[track_id] = routes
+                matcher.restrict(self.route_index.members(routes))
+        self.last_seen[track_id] = self.frame
+
+    def predict(self, track_id, horizon=50):
+        """Returns up to ``horizon`` future points of the track's best prefix match."""
+        matcher = self.tracks.get(track_id)
+        best_ids = matcher.best()[0] if matcher is not None else ()
+        if not len(best_ids):
+            return np.empty((0, 2), dtype=self.store.points.dtype)
+        return self.store[best_ids[0]][matcher.count:matcher.count + horizon]
+
+    def end_frame(self):
+        """Expires tracks not seen for more than max_age frames and returns their ids."""
+        lost_ids = [track_id for track_id, seen in self.last_seen.items() if self.frame - seen > self.max_age]
+        for track_id in lost_ids:
+            del self.tracks[track_id], self.last_seen[track_id]
+            self.route_errors.pop(track_id, None)
+            self.route_sets.pop(track_id, None)
+        self.frame += 1
+        return lost_ids
@@ -0,0 +1,127 @@
+"""Vectorized noise models for flat trajectory arrays.
+
+Every model is called as ``model(points, offsets, rng)`` on a chunk of
+trajectories (float points, chunk-local offsets) and returns the new points
+and offsets, so models that drop or reorder points compose with those that
+only perturb them.
+"""
+import numpy as np
+
+import trajstore
+
+
+def _owners(offsets):
+    """Trajectory index and step along it for every flat point."""
+    lengths = np.diff(offsets)
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    return owner, np.arange(offsets[-1]) - offsets[owner]
+
+
+class UniformNoise:
+    """Independent uniform jitter in [-size, size] on each coordinate."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __call__(self, points, offsets, rng):
+        return points + rng.uniform(-self.size, self.size, size=points.shape), offsets
+
+
+class GaussianNoise:
+    """Independent Gaussian jitter with standard deviation sigma on each coordinate."""
+
+    def __init__(self, sigma):
+        self.sigma = sigma
+
+    def __call__(self, points, offsets, rng):
+        return points + rng.normal(0.0, self.sigma, size=points.shape), offsets
+
+
+class CorrelatedNoise:
+    """Temporally correlated AR(1) jitter: e[t] = rho * e[t - 1] + sqrt(1 - rho^2) * sigma * w[t].
+
+    The recursion runs over time steps, each step vectorized across every
+    trajectory of the chunk, so its cost is O(max length) NumPy operations.
+    """
+
+    def __init__(self, sigma, rho=0.9):
+        self.sigma = sigma
+        self.rho = rho
+
+    def __call__(self, points, offsets, rng):
+        innovations, lengths = trajstore.pad(
+            rng.normal(0.0, self.sigma, size=points.shape), offsets, fill=0.0, dtype=np.float64
+        )
+        innovations[:, 1:] *= np.sqrt(1 - self.rho ** 2)  # Stationary variance sigma^2
+        for step in range(1, innovations.shape[1]):
+            innovations[:, step] += self.rho * innovations[:, step - 1]
+        owner, step = _owners(offsets)
+        return points + innovations[owner, step], offsets
+
+
+class DroppedFrames:
+    """Drops each detection with the given probability, like missed YOLO detections."""
+
+    def __init__(self, probability):
+        self.probability = probability
+
+    def __call__(self, points, offsets, rng):
+        keep = rng.random(len(points)) >= self.probability
+        owner, _ = _owners(offsets)
+        new_offsets = np.zeros_like(offsets)
+        np.cumsum(np.bincount(owner[keep], minlength=len(offsets) - 1), out=new_offsets[1:])
+        return points[keep], new_offsets
+
+
+class IdSwitches:
+    """Swaps the tails of random trajectory pairs at a common step, like DeepSort id switches.
+
+    Each trajectory takes part with the given probability. A switched id keeps
+    its own head and continues on its partner's tail, which produces the
+    teleport jumps seen in ``realData/data.txt``.
+    """
+
+    def __init__(self, probability):
+        self.probability = probability
+
+    def __call__(self, points, offsets, rng):
+        lengths = np.diff(offsets)
+        chosen = rng.permutation(np.nonzero(rng.random(len(lengths)) < self.probability)[0])
+        first, second = chosen[0:len(chosen) // 2 * 2:2], chosen[1:len(chosen) // 2 * 2:2]
+
+        # Partner whose tail each trajectory continues on, and the step of the switch
+        partner = np.arange(len(lengths))
+        partner[first], partner[second] = second, first
+        cut = np.full(len(lengths), np.iinfo(np.int64).max)
+        pair_cut = (rng.random(len(first)) * np.minimum(lengths[first], lengths[second])).astype(np.int64)
+        cut[first] = cut[second] = pair_cut
+
+        new_lengths = lengths[partner]
+        new_offsets = np.zeros_like(offsets)
+        np.cumsum(new_lengths, out=new_offsets[1:])
+        owner, step = _owners(new_offsets)
+        source = np.where(step < cut[owner], owner, partner[owner])
+        return points[offsets[source] + step], new_offsets
+
+
+def apply_models(points, offsets, models, rng):
+    """Runs a chunk through every noise model in order."""
+    points = np.asarray(points, dtype=np.float64)
+    for model in models:
+        points, offsets = model(points, offsets, rng)
+    return points, offsets
+
+
+def add_noise(store, output_path, models, seed=None, chunk_size=10000):
+    """Streams a store through the noise models into a new store, chunk_size trajectories at a time."""
+    rng = np.random.default_rng(seed)
+    with trajstore.StoreWriter(output_path, class_names=store.class_names) as writer:
+        for start in range(0, len(store), chunk_size):
+            stop = min(start + chunk_size, len(store))
+            offsets = store.offsets[start:stop + 1] - store.offsets[start]
+            points = store.points[store.offsets[start]:store.offsets[stop]]
+            points, offsets = apply_models(points, offsets, models, rng)
+            writer.append(
+                points, offsets, ids=store.ids[start:stop],
+                classes=store.classes[start:stop], speeds=store.speeds[start:stop],
+            )
@@ -1,27 +1,18 @@
-import ast
-import random
+import trajstore
+from noise import UniformNoise, add_noise
 
 # Parameters
 noise_size = 0.1  # Maximum noise to add to each coordinate
+seed = None  # Set to an int for reproducible noise
+chunk_size = 10000  # Trajectories processed per chunk
 
-# Load trajectories from data.txt
-trajectories_with_noise = []
-with open("data.txt", "r") as file:
-    for line in file:
-        # Parse the trajectory from the file
-        object_id, trajectory_data = line.split("->")
-        trajectory_str, speed_data = trajectory_data.split("(speed:")  # Extract speed separately
-        trajectory = ast.literal_eval(trajectory_str.strip())
-        speed = float(speed_data.strip().rstrip(")"))
-        
-        # Add random noise to each point in the trajectory
-        noisy_trajectory = [
-            (x + random.uniform(-noise_size, noise_size), y + random.uniform(-noise_size, noise_size))
-            for x, y in trajectory
-        ]
-        trajectories_with_noise.append((object_id.strip(), noisy_trajectory, speed))
+# Noise models applied in order; import and add e.g. GaussianNoise(0.05), CorrelatedNoise(0.1, rho=0.9),
+# DroppedFrames(0.02) or IdSwitches(0.01) to mimic the DeepSort artifacts in realData/data.txt
+models = [UniformNoise(noise_size)]
 
-# Save trajectories with noise to data_with_noise.txt
-with open("data_with_noise.txt", "w") as file:
-    for object_id, noisy_trajectory, speed in trajectories_with_noise:
-        file.write(f"{object_id} -> {noisy_trajectory} (speed: {speed})\n")
+if __name__ == "__main__":
+    # Load trajectories from the data.traj store
+    store = trajstore.load("data.traj")
+
+    # Save trajectories with noise to the data_with_noise.traj store, one chunk at a time
+    add_noise(store, "data_with_noise.traj", models, seed=seed, chunk_size=chunk_size)
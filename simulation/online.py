@@ -0,0 +1,226 @@
+"""Online prediction service for many concurrently tracked objects."""
+import numpy as np
+
+import instrument
+import trajstore
+from spatial import TrajectoryIndex
+
+
+class TrackState:
+    """Per-track matching state: observed prefix, surviving candidates and current best match.
+
+    ``scores`` holds each candidate's summed squared distance over the
+    observed prefix, aligned with ``candidate_ids``.
+    """
+
+    def __init__(self, candidate_ids, distances, frame):
+        self.observed = []
+        self.candidate_ids = candidate_ids
+        self.scores = np.asarray(distances, dtype=np.float64) ** 2
+        self.best_id = candidate_ids[np.argmin(distances)] if len(candidate_ids) else None
+        self.last_seen = frame
+
+
+class Distribution:
+    """Top-k hypotheses of a track's future and their aggregate.
+
+    ``futures`` is (k, horizon, 2), NaN where a hypothesis has ended;
+    ``mean`` and ``covariance`` are the weighted per-step moments over the
+    hypotheses still running, and ``exit_probabilities`` sums the weights by
+    the exit of each hypothesis (None when the predictor has no exit labels).
+    """
+
+    def __init__(self, ids, weights, futures, mean, covariance, exit_probabilities):
+        self.ids = ids
+        self.weights = weights
+        self.futures = futures
+        self.mean = mean
+        self.covariance = covariance
+        self.exit_probabilities = exit_probabilities
+
+
+class Predictor:
+    """Matches many live tracks against a trajectory library by position at each step.
+
+    Updates are buffered with ``update`` and applied together, so all tracks
+    observed in the same frame are filtered in one vectorized pass over their
+    concatenated candidate sets. Tracks not updated for ``max_age`` frames are
+    expired by ``end_frame``, like lost ids in ``dataGen.py``.
+
+    ``exits`` optionally labels the exit of every library trajectory (see
+    ``routes.exit_labels``) so ``predict_distribution`` can report per-exit
+    probabilities; ``noise_sigma`` is the position noise, in library units,
+    that sets how sharply it weighs its hypotheses. ``plausible`` optionally
+    flags which of a (k, horizon, 2) stack of futures the scene allows, e.g.
+    ``calibration.SceneGrid.plausible``, so impossible ones are pruned.
+
+    Each track's candidates are a compact survivor array that only shrinks;
+    if it ever empties, the track is re-searched in the spatial index at its
+    current step rather than left without a prediction.
+    """
+
+    def __init__(self, store, initial_distance_threshold=2.0, dynamic_distance_threshold=3.0,
+                 cell_size=1.0, max_age=30, exclude=(), exits=None, noise_sigma=0.1, plausible=None):
+        self.store = store
+        self.initial_distance_threshold = initial_distance_threshold
+        self.dynamic_distance_threshold = dynamic_distance_threshold
+        self.max_age = max_age
+        self.noise_sigma = noise_sigma
+        self.plausible = plausible
+        self.index = TrajectoryIndex.from_store(store, cell_size=cell_size)
+        self.library, self.lengths = trajstore.pad(store.points, store.offsets)
+        self.excluded = np.zeros(len(self.lengths), dtype=bool)
+        self.excluded[list(exclude)] = True
+        self.exits = None if exits is None else np.asarray(exits, dtype=np.int64)
+        self.tracks = {}
+        self.pending = {}
+        self.frame = 0
+
+    def update(self, track_id, point):
+        """Buffers a new observation of a track for the current frame."""
+        self.pending[track_id] = point
+
+    def _search(self, step, point, radius):
+        """Library trajectories whose point at ``step`` lies within ``radius``, minus the excluded ones."""
+        candidate_ids, distances = self.index.query(step, point, radius, return_distance=True)
+        keep = ~self.excluded[candidate_ids]
+        return candidate_ids[keep].astype(np.int64), distances[keep]
+
+    def flush(self):
+        """Applies every buffered observation in one batched filtering pass."""
+        if not self.pending:
+            return
+        with instrument.span("online.flush"):
+            self._flush()
+
+    def _flush(self):
+        updates, self.pending = self.pending, {}
+
+        # New tracks start from the library trajectories beginning near their first point
+        existing = []
+        for track_id, point in updates.items():
+            state = self.tracks.get(track_id)
+            if state is None:
+                state = self.tracks[track_id] = TrackState(*self._search(0, point, self.initial_distance_threshold), self.frame)
+            else:
+                state.last_seen = self.frame
+                existing.append(state)
+            state.observed.append(point)
+        if not existing:
+            return
+
+        # Existing tracks: gather every candidate's point at that track's step at once
+        states = existing
+        counts = np.array([len(state.candidate_ids) for state in states])
+        owner = np.repeat(np.arange(len(states)), counts)
+        candidate_ids = np.concatenate([state.candidate_ids for state in states]).astype(np.int64)
+        scores = np.concatenate([state.scores for state in states])
+        steps = np.array([len(state.observed) - 1 for state in states])[owner]
+        positions = np.array([state.observed[-1] for state in states], dtype=np.float64)[owner]
+
+        valid = steps < self.lengths[candidate_ids]
+        matched = self.library[candidate_ids, np.minimum(steps, self.library.shape[1] - 1)]
+        distances = np.hypot(*(matched - positions).T)
+        keep = valid & (distances <= self.dynamic_distance_threshold)
+
+        # Prune and pick each track's closest survivor in the same pass; survivors stay grouped by track
+        survivors = np.flatnonzero(keep)
+        candidate_ids, scores, distances = candidate_ids[survivors], scores[survivors] + distances[survivors] ** 2, distances[survivors]
+        bounds = np.searchsorted(owner[survivors], np.arange(len(states) + 1))
+        occupied = bounds[:-1] < bounds[1:]
+        starts = bounds[:-1][occupied]
+        closest = np.minimum.reduceat(distances, starts) if len(starts) else np.empty(0)
+        is_best = np.flatnonzero(distances == np.repeat(closest, np.diff(np.append(starts, len(distances)))))
+        best = is_best[np.searchsorted(is_best, starts)]  # First closest survivor of every occupied group
+
+        instrument.count("online.candidates", len(candidate_ids))
+        group = 0
+        for position, state in enumerate(states):
+            if not occupied[position]:
+                self._research(state)
+                continue
+            state.candidate_ids = candidate_ids[bounds[position]:bounds[position + 1]]
+            state.scores = scores[bounds[position]:bounds[position + 1]]
+            state.best_id = candidate_ids[best[group]]
+            group += 1
+
+    def _research(self, state):
+        """Refills a track whose candidates all drifted away by searching the library at its current step."""
+        instrument.count("online.researched")
+        step = len(state.observed) - 1
+        candidate_ids, distances = self._search(step, state.observed[-1], self.dynamic_distance_threshold)
+        state.candidate_ids = candidate_ids
+        state.scores = distances ** 2 * len(state.observed)  # As if they had matched this well all along
+        state.best_id = candidate_ids[np.argmin(distances)] if len(candidate_ids) else None
+
+    def predict(self, track_id, horizon=50):
+        """Returns up to ``horizon`` future points of a track's best-matching library trajectory."""
+        self.flush()
+        state = self.tracks.get(track_id)
+        if state is None or state.best_id is None:
+            return np.empty((0, 2), dtype=self.store.points.dtype)
+        start = len(state.observed)
+        return self.store[state.best_id][start:start + horizon]
+
+    def predict_distribution(self, track_id, horizon=50, k=10, sigma=None):
+        """Returns the k best candidates as weighted hypotheses of the track's future, or None.
+
+        Candidates are ranked by mean squared distance over the observed
+        prefix and weighted by a Gaussian kernel of width ``sigma``, by default
+        the predictor's ``noise_sigma``: hypotheses whose errors differ by less
+        than the position noise weigh alike, and one that fits clearly better
+        than the rest dominates. Futures, moments and exit probabilities come
+        from one gather over the k candidates; with ``plausible`` the futures
+        the scene rules out are dropped before weighting.
+        """
+        self.flush()
+        state = self.tracks.get(track_id)
+        if state is None or not len(state.candidate_ids):
+            return None
+        # Top k by prefix error, best first
+        errors = state.scores / len(state.observed)
+        k = min(k, len(errors))
+        top = np.argpartition(errors, k - 1)[:k]
+        top = top[np.argsort(errors[top], kind="stable")]
+        ids = state.candidate_ids[top].astype(np.int64)
+
+        # Every hypothesis' next horizon points; steps past a trajectory's end are NaN in the padded library
+        steps = len(state.observed) + np.arange(horizon)
+        futures = np.full((k, horizon, 2), np.nan, dtype=np.float64)
+        inside = steps < self.library.shape[1]
+        futures[:, inside] = self.library[ids[:, None], steps[inside]]
+        if self.plausible is not None:
+            keep = np.asarray(self.plausible(futures), dtype=bool)
+            instrument.count("online.implausible", int((~keep).sum()))
+            if keep.any():  # A scene that rules out every hypothesis is ignored rather than predicting nothing
+                top, ids, futures = top[keep], ids[keep], futures[keep]
+
+        spread = errors[top] - errors[top[0]]  # Shifted so the best weighs 1
+        bandwidth = 2 * (self.noise_sigma if sigma is None else sigma) ** 2
+        weights = np.exp(-spread / bandwidth)
+        weights /= weights.sum()
+
+        # Per-step moments over the hypotheses still running, renormalizing their weights
+        running = ~np.isnan(futures[..., 0])
+        step_weights = np.where(running, weights[:, None], 0.0)
+        totals = step_weights.sum(axis=0)
+        step_weights = np.divide(step_weights, totals, out=np.zeros_like(step_weights), where=totals > 0)
+        filled = np.where(running[..., None], futures, 0.0)
+        mean = (step_weights[..., None] * filled).sum(axis=0)
+        deviations = np.where(running[..., None], filled - mean, 0.0)
+        covariance = np.einsum("kh,khi,khj->hij", step_weights, deviations, deviations)
+        length = int(running.any(axis=0).sum())  # Hypotheses end in order of step, so running steps are a prefix
+
+        exit_probabilities = None
+        if self.exits is not None:
+            exit_probabilities = np.bincount(self.exits[ids], weights=weights, minlength=self.exits.max() + 1)
+        return Distribution(ids, weights, futures[:, :length], mean[:length], covariance[:length], exit_probabilities)
+
+    def end_frame(self):
+        """Flushes the frame, expires lost tracks and returns their ids."""
+        self.flush()
+        lost_ids = [track_id for track_id, state in self.tracks.items() if self.frame - state.last_seen > self.max_age]
+        for track_id in lost_ids:
+            del self.tracks[track_id]
+        self.frame += 1
+        return lost_ids
@@ -0,0 +1,23 @@
+import headless
+from flowfield import FlowFieldPredictor
+
+# Parameters
+num_frames = 200  # Total number of frames
+prediction_horizon = 50  # Number of points to predict
+cell_size = 1.0  # Grid cell size of the flow field
+heading_bins = 16  # Direction bins per cell
+speed_window = 5  # Recent steps averaged for the track's own speed
+test_ids = [0]  # Library trajectories replayed as live tracks
+
+def make_engine(trajectories, test_ids):
+    """Flow-field rollout learned from the library without the test trajectories."""
+    return FlowFieldPredictor(
+        trajectories, cell_size=cell_size, heading_bins=heading_bins,
+        speed_window=speed_window, exclude=test_ids,
+    )
+
+if __name__ == "__main__":
+    headless.main(
+        make_engine, data="data_with_noise.traj", test_ids=test_ids, num_frames=num_frames,
+        horizon=prediction_horizon, video="prediction_video_flow_field.mp4",
+    )
@@ -0,0 +1,132 @@
+"""Fast frame rendering shared by the simulation, replay and prediction scripts."""
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+import instrument
+import trajstore
+from roundabout import inner_radius, outer_radius, roundabout_center
+
+# Parameters
+width, height = 500, 500  # Canvas dimensions
+scale = 20  # Scaling for coordinates to fit the canvas
+dot_radius = 3  # Radius of each drawn object, in pixels
+
+
+class FrameRenderer:
+    """Draws dots onto a reused uint8 frame buffer over a static roundabout background.
+
+    The background is drawn with PIL once. Each frame starts as a copy of it,
+    and dots are stamped for all points at once by scattering a small disc
+    stencil into the buffer with NumPy indexing.
+    """
+
+    def __init__(self, width=width, height=height, scale=scale, dot_radius=dot_radius):
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.background = self._draw_background()
+        self.buffer = np.empty_like(self.background)
+
+        # Pixel offsets of a filled disc, close to PIL's 7x7 ellipse for radius 3
+        dy, dx = np.mgrid[-dot_radius:dot_radius + 1, -dot_radius:dot_radius + 1]
+        inside = dx ** 2 + dy ** 2 <= (dot_radius + 0.5) ** 2
+        self.stencil_rows = dy[inside]
+        self.stencil_cols = dx[inside]
+
+    def _draw_background(self):
+        """Draws the roundabout (inner and outer circles) once."""
+        img = Image.new("RGB", (self.width, self.height), "white")
+        draw = ImageDraw.Draw(img)
+        center = self.to_canvas_coords(np.asarray([roundabout_center]))[0]
+        for radius in (outer_radius, inner_radius):
+            radius_scaled = radius * self.scale
+            draw.ellipse(
+                [center[0] - radius_scaled, center[1] - radius_scaled,
+                 center[0] + radius_scaled, center[1] + radius_scaled],
+                outline="black", width=2
+            )
+        return np.array(img)
+
+    def to_canvas_coords(self, points):
+        """Converts an (N, 2) array of simulation coordinates to (N, 2) canvas columns and rows."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cols = (self.width / 2 + points[:, 0] * self.scale).astype(np.int64)
+        rows = (self.height / 2 - points[:, 1] * self.scale).astype(np.int64)
+        return np.column_stack((cols, rows))
+
+    def begin(self):
+        """Resets the buffer to the background and returns it."""
+        np.copyto(self.buffer, self.background)
+        return self.buffer
+
+    def stamp(self, points, color):
+        """Draws a dot at every point in one scatter."""
+        canvas = self.to_canvas_coords(points)
+        rows = (canvas[:, 1, None] + self.stencil_rows).ravel()
+        cols = (canvas[:, 0, None] + self.stencil_cols).ravel()
+        visible = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        self.buffer[rows[visible], cols[visible]] = ImageColor.getrgb(color)
+
+    def render(self, layers):
+        """Renders one frame from (points, color) layers, drawn in order."""
+        self.begin()
+        for points, color in layers:
+            self.stamp(points, color)
+        return self.buffer
+
+    def video(self, filename, fps=30, codec="libx264"):
+        """Opens a VideoStream sized for this renderer."""
+        return VideoStream(filename, self.width, self.height, fps=fps, codec=codec)
+
+
+def render_stream(stream, video, every=1, start=0, stop=None, renderer=None):
+    """Passes a prediction stream through unchanged, drawing every Nth frame of [start, stop) to video.
+
+    Observed points are drawn in blue and predicted points in red.
+    """
+    renderer = renderer or FrameRenderer()
+    observed = {}
+    for frame_idx, observations, predictions in stream:
+        for track_id, point in observations.items():
+            observed.setdefault(track_id, []).append(point)
+        if frame_idx >= start and (stop is None or frame_idx < stop) and (frame_idx - start) % every == 0:
+            with instrument.span("render.draw"):
+                layers = [(np.asarray(points), "blue") for points in observed.values()]
+                layers += [(points, "red") for points in predictions.values()]
+                frame = renderer.render(layers)
+            with instrument.span("render.encode"):
+                video.write(frame)
+        yield frame_idx, observations, predictions
+
+
+def render_store(store, filename, num_frames=None, fps=30):
+    """Streams every object of a store at each frame to a video, up to its longest trajectory by default."""
+    num_frames = int(store.lengths.max()) if num_frames is None else num_frames
+    renderer = FrameRenderer()
+    with renderer.video(filename, fps=fps) as video:
+        for frame_idx in range(num_frames):
+            # Draw all objects up to the current frame
+            positions = trajstore.points_at(store.points, store.offsets, frame_idx)
+            video.write(renderer.render([(positions, "blue")]))
+
+
+class VideoStream:
+    """Writes frames straight to the ffmpeg encoder instead of collecting them in memory."""
+
+    def __init__(self, filename, width, height, fps=30, codec="libx264"):
+        from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+        self.filename = filename
+        self.writer = FFMPEG_VideoWriter(filename, (width, height), fps, codec=codec)
+
+    def write(self, frame):
+        self.writer.write_frame(frame)
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
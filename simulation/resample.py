@@ -0,0 +1,102 @@
+"""Vectorized trajectory resampling into speed-invariant, equal-length descriptors for route clustering."""
+import os
+
+import numpy as np
+
+
+def _arc_positions(points, offsets):
+    """Cumulative arc length of every flat point, restarting at 0 for each trajectory."""
+    starts = offsets[:-1]
+    steps = np.hypot(*np.diff(points, axis=0).T)
+    boundaries = starts[1:] - 1
+    steps[boundaries[boundaries >= 0]] = 0  # No segment across trajectory boundaries
+    position = np.concatenate(([0.0], np.cumsum(steps)))
+    return position, position[starts]
+
+
+def _interpolate(points, position, owner, target, starts, ends):
+    """Linearly interpolates points where the monotone ``position`` reaches ``target``.
+
+    ``owner`` gives the trajectory of every target, whose flat points span
+    ``starts[owner]`` to ``ends[owner]`` inclusive.
+    """
+    left = np.searchsorted(position, target, side="right") - 1
+    left = np.clip(left, starts[owner], np.maximum(ends[owner] - 1, starts[owner]))
+    right = np.minimum(left + 1, ends[owner])
+    span = position[right] - position[left]
+    fraction = np.divide(target - position[left], span, out=np.zeros_like(span), where=span > 0)
+    fraction = np.clip(fraction, 0.0, 1.0)
+    return points[left] + (points[right] - points[left]) * fraction[:, None]
+
+
+def resample(points, offsets, num_samples=32, mode="arc"):
+    """Resamples every trajectory to num_samples points, evenly spaced by arc length or by time.
+
+    Returns an (N, num_samples, 2) float32 array. Arc-length descriptors do
+    not depend on speed: the same path driven at 0.5 or 1.5 gives the same
+    vector.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    if np.any(lengths == 0):
+        raise ValueError("Cannot resample empty trajectories")
+    starts, ends = offsets[:-1], offsets[1:] - 1
+    owner = np.repeat(np.arange(len(lengths)), num_samples)
+    fractions = np.tile(np.linspace(0.0, 1.0, num_samples), len(lengths))
+
+    if mode == "arc":
+        position, begin = _arc_positions(points, offsets)
+        total = position[ends] - begin
+        target = begin[owner] + total[owner] * fractions
+    elif mode == "time":
+        # Frame index plays the role of position, so samples are evenly spaced in time
+        position = np.arange(len(points), dtype=np.float64)
+        target = starts[owner] + (lengths[owner] - 1) * fractions
+    else:
+        raise ValueError(f"Unknown resampling mode: {mode}")
+
+    samples = _interpolate(points, position, owner, target, starts, ends)
+    return samples.reshape(len(lengths), num_samples, 2).astype(np.float32)
+
+
+def resample_spacing(points, offsets, spacing):
+    """Resamples every trajectory at a fixed arc-length step, returning new flat points and offsets.
+
+    Unlike ``resample`` the output stays ragged, but the i-th sample of every
+    trajectory lies i * spacing along its path. A growing observed prefix can
+    therefore be matched step by step (e.g. with ``PrefixMatcher``) without
+    depending on speed.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    starts, ends = offsets[:-1], offsets[1:] - 1
+    position, begin = _arc_positions(points, offsets)
+    counts = (np.floor((position[ends] - begin) / spacing) + 1).astype(np.int64)
+
+    new_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    owner = np.repeat(np.arange(len(counts)), counts)
+    target = begin[owner] + (np.arange(new_offsets[-1]) - new_offsets[owner]) * spacing
+    return _interpolate(points, position, owner, target, starts, ends).astype(np.float32), new_offsets
+
+
+def descriptors(store, num_samples=32, mode="arc", batch_size=10000):
+    """Returns cached descriptors for a store, computing them in batches on first use.
+
+    The cache lives inside the store directory and is rebuilt whenever the
+    store's points are newer than it.
+    """
+    cache_path = os.path.join(store.path, f"resampled_{mode}_{num_samples}.npy")
+    points_path = os.path.join(store.path, "points.npy")
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(points_path):
+        return np.load(cache_path, mmap_mode="r")
+
+    cache = np.lib.format.open_memmap(cache_path, mode="w+", dtype=np.float32, shape=(len(store), num_samples, 2))
+    for start in range(0, len(store), batch_size):
+        stop = min(start + batch_size, len(store))
+        offsets = store.offsets[start:stop + 1] - store.offsets[start]
+        points = store.points[store.offsets[start]:store.offsets[stop]]
+        cache[start:stop] = resample(points, offsets, num_samples=num_samples, mode=mode)
+    cache.flush()
+    return np.load(cache_path, mmap_mode="r")
@@ -0,0 +1,75 @@
+"""Roundabout geometry and the batched synthetic trajectory generator."""
+import numpy as np
+
+# Parameters
+inner_radius = 3  # Inner radius of the roundabout
+outer_radius = 6  # Outer radius of the roundabout
+entry_points = [(10, 0), (0, 10), (-10, 0), (0, -10)]  # Four entry points
+exit_angles_relative = [np.pi / 2, np.pi, 3 * np.pi / 2, 2 * np.pi]  # Relative exit angles
+roundabout_center = (0, 0)
+theta_step = np.pi / 60  # Angle step for smooth movement
+entry_length = 30  # Linear movement distance before reaching the roundabout
+exit_length = 30  # Linear movement distance after exiting
+min_speed = 0.5  # Minimum speed (steps per frame)
+max_speed = 1.5  # Maximum speed (steps per frame)
+
+
+def generate_trajectories(num_objects, seed=None):
+    """Generates entry, circular and tangential exit paths for many objects at once.
+
+    Returns flat ``points`` (P, 2), ``offsets`` (N + 1), ``speeds``, the entry
+    index into ``entry_points`` and the chosen exit (1-3) of every object.
+    ``seed`` may be an int or an existing ``np.random.Generator`` so large
+    datasets can be produced in reproducible chunks.
+    """
+    rng = np.random.default_rng(seed)
+    entry_index = rng.integers(len(entry_points), size=num_objects)
+    speeds = rng.uniform(min_speed, max_speed, size=num_objects)
+    radii = rng.uniform(inner_radius, outer_radius, size=num_objects)  # Random radius between inner and outer bounds
+    exits = rng.integers(1, 4, size=num_objects)  # Random exit choice
+
+    center = np.asarray(roundabout_center, dtype=float)
+    entries = np.asarray(entry_points, dtype=float)[entry_index]
+    entry_vectors = entries - center
+    entry_angles = np.mod(np.arctan2(entry_vectors[:, 1], entry_vectors[:, 0]), 2 * np.pi)
+    # Counterclockwise movement, so the exit is always ahead of the entry
+    sweep = np.asarray(exit_angles_relative)[exits - 1]
+    target_angles = entry_angles + sweep
+
+    # Points per segment, adjusted by speed
+    entry_steps = (entry_length / speeds).astype(np.int64)
+    circular_steps = (sweep / (speeds * theta_step)).astype(np.int64)
+    exit_steps = (exit_length / speeds).astype(np.int64)
+    lengths = entry_steps + circular_steps + exit_steps
+    offsets = np.zeros(num_objects + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    # Owner object and position along its own trajectory for every flat point
+    owner = np.repeat(np.arange(num_objects), lengths)
+    step = np.arange(offsets[-1]) - offsets[owner]
+    points = np.empty((offsets[-1], 2))
+
+    # Linear movement from the entry point onto the roundabout
+    in_entry = step < entry_steps[owner]
+    obj = owner[in_entry]
+    alpha = (step[in_entry] / entry_steps[obj])[:, None]
+    final_positions = center + radii[:, None] * np.column_stack((np.cos(entry_angles), np.sin(entry_angles)))
+    points[in_entry] = entries[obj] * (1 - alpha) + final_positions[obj] * alpha
+
+    # Move along the roundabout to the exit angle (inclusive, like np.linspace)
+    step = step - entry_steps[owner]
+    in_circle = ~in_entry & (step < circular_steps[owner])
+    obj = owner[in_circle]
+    fraction = step[in_circle] / np.maximum(circular_steps[obj] - 1, 1)
+    angles = entry_angles[obj] + (target_angles[obj] - entry_angles[obj]) * fraction
+    points[in_circle] = center + radii[obj, None] * np.column_stack((np.cos(angles), np.sin(angles)))
+
+    # Move tangentially out of the roundabout from the last circular point
+    step = step - circular_steps[owner]
+    in_exit = ~in_entry & ~in_circle
+    obj = owner[in_exit]
+    exit_directions = np.column_stack((np.cos(target_angles), np.sin(target_angles)))
+    last_positions = center + radii[:, None] * exit_directions
+    points[in_exit] = last_positions[obj] + exit_directions[obj] * (step[in_exit] / 5)[:, None]
+
+    return points, offsets, speeds, entry_index, exits
@@ -0,0 +1,138 @@
+"""Offline route clustering of a trajectory library and the persisted prototype index."""
+import os
+
+import numpy as np
+
+import trajstore
+from resample import descriptors, resample_spacing
+
+
+def kmeans(data, num_clusters, iterations=50, restarts=10, seed=None):
+    """Lloyd's k-means with k-means++ seeding, keeping the best of several restarts."""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float64)
+    squared_norms = (data ** 2).sum(axis=1)
+    best = None
+    for _ in range(restarts):
+        centers, labels = _lloyd(data, squared_norms, num_clusters, iterations, rng)
+        inertia = ((data - centers[labels]) ** 2).sum()
+        if best is None or inertia < best[0]:
+            best = (inertia, centers, labels)
+    return best[1], best[2]
+
+
+def _lloyd(data, squared_norms, num_clusters, iterations, rng):
+    """One k-means run from a k-means++ seeding."""
+
+    # k-means++: each new center is drawn proportionally to its squared distance from the others
+    centers = [data[rng.integers(len(data))]]
+    closest = ((data - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, num_clusters):
+        centers.append(data[rng.choice(len(data), p=closest / closest.sum())] if closest.sum() > 0 else data[0])
+        closest = np.minimum(closest, ((data - centers[-1]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    labels = np.full(len(data), -1)
+    for _ in range(iterations):
+        distances = squared_norms[:, None] - 2 * data @ centers.T + (centers ** 2).sum(axis=1)
+        new_labels = np.argmin(distances, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=num_clusters)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, data)
+        centers = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+
+        # Reseed empty clusters at the points worst served by their center
+        for cluster in np.nonzero(counts == 0)[0]:
+            centers[cluster] = data[np.argmax(distances[np.arange(len(data)), labels])]
+    return centers, labels
+
+
+def exit_labels(store, num_exits=4, iterations=50, restarts=10, seed=0):
+    """Labels every trajectory of a store with an exit by clustering the trajectories' final points."""
+    ends = np.asarray(store.points[store.offsets[1:] - 1], dtype=np.float64)
+    _, labels = kmeans(ends, num_exits, iterations, restarts, seed)
+    return labels
+
+
+class RouteIndex:
+    """Route prototypes of a library plus the library ids belonging to each route.
+
+    Prototypes are cluster centers of arc-length descriptors. An observed
+    prefix is classified by how far its points lie from each prototype path,
+    which costs O(routes) regardless of library size; matching then only has
+    to look at the members of the chosen routes.
+    """
+
+    def __init__(self, centers, labels, spacing=0.5):
+        self.centers = np.asarray(centers, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.spacing = spacing
+        self.order = np.argsort(self.labels, kind="stable")
+        self.bounds = np.searchsorted(self.labels[self.order], np.arange(len(self.centers) + 1))
+        self._members = {}  # Route set -> sorted member ids
+
+        # Prototypes densely resampled at a fixed arc step for nearest-point lookups
+        num_samples = self.centers.shape[1]
+        offsets = np.arange(len(self.centers) + 1) * num_samples
+        points, offsets = resample_spacing(self.centers.reshape(-1, 2), offsets, spacing)
+        self.prototypes, self.prototype_lengths = trajstore.pad(points, offsets)
+
+    @classmethod
+    def build(cls, store, num_routes=12, num_samples=32, spacing=0.5, iterations=50, restarts=10, seed=None):
+        """Clusters every trajectory of a store into num_routes routes (4 entries x 3 exits by default)."""
+        paths = descriptors(store, num_samples=num_samples, mode="arc")
+        centers, labels = kmeans(np.asarray(paths).reshape(len(store), -1), num_routes, iterations, restarts, seed)
+        return cls(centers.reshape(num_routes, num_samples, 2), labels, spacing=spacing)
+
+    def save(self, path):
+        np.savez(path, centers=self.centers, labels=self.labels, spacing=self.spacing)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["centers"], data["labels"], spacing=float(data["spacing"]))
+
+    @classmethod
+    def load_or_build(cls, store, num_routes=12, num_samples=32, spacing=0.5, iterations=50, restarts=10, seed=0):
+        """Loads the index cached in the store directory, building it when missing or stale.
+
+        The cache name holds every build parameter, so asking for another
+        clustering never reuses an index built with different settings.
+        """
+        name = f"routes_{num_routes}_{num_samples}_{spacing:g}_{iterations}_{restarts}_{seed}.npz"
+        path = os.path.join(store.path, name)
+        points_path = os.path.join(store.path, "points.npy")
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(points_path):
+            return cls.load(path)
+        index = cls.build(store, num_routes, num_samples, spacing, iterations, restarts, seed)
+        index.save(path)
+        return index
+
+    def point_distances(self, point):
+        """Squared distance from one point to the nearest point of every prototype path.
+
+        Summed over a track's points as they arrive, this classifies a prefix
+        incrementally: one lookup per new point instead of resampling the
+        whole prefix every frame.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        return np.nanmin(((self.prototypes - point) ** 2).sum(axis=2), axis=1)
+
+    @staticmethod
+    def select(distances, tolerance=1.0):
+        """Routes whose distance is within tolerance of the best one, as a tuple usable as a key.
+
+        Routes sharing an entry cannot be told apart until the vehicle nears
+        its exit, so every plausible route is kept rather than a single guess.
+        """
+        return tuple(np.nonzero(distances <= distances.min() + tolerance)[0].tolist())
+
+    def members(self, routes):
+        """Sorted library ids of every trajectory in the given routes, cached per route set."""
+        key = tuple(np.atleast_1d(routes).tolist())
+        if key not in self._members:
+            self._members[key] = np.sort(np.concatenate([self.order[self.bounds[route]:self.bounds[route + 1]] for route in key]))
+        return self._members[key]
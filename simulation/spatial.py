@@ -0,0 +1,62 @@
+"""Spatial index over trajectory points keyed by (time step, grid cell)."""
+import numpy as np
+
+
+class TrajectoryIndex:
+    """Uniform grid per time step answering "trajectories within r of p at step t".
+
+    Every point is bucketed by its step along its trajectory and by the grid
+    cell it falls in. Buckets are kept in one array sorted by a combined
+    (step, row, column) key, so a query only binary-searches the handful of
+    rows covering the search disc instead of scanning every trajectory.
+    """
+
+    def __init__(self, points, offsets, cell_size=1.0):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(offsets)
+        owner = np.repeat(np.arange(len(lengths)), lengths)
+        steps = np.arange(len(points)) - offsets[owner]
+
+        self.cell_size = cell_size
+        self.num_trajectories = len(lengths)
+        self.origin = points.min(axis=0) if len(points) else np.zeros(2)
+        cells = np.floor((points - self.origin) / cell_size).astype(np.int64)
+        self.shape = cells.max(axis=0) + 1 if len(points) else np.ones(2, dtype=np.int64)
+
+        keys = self._key(steps, cells[:, 1], cells[:, 0])
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.owner = owner[order]
+        self.points = points[order]
+
+    @classmethod
+    def from_store(cls, store, cell_size=1.0):
+        """Builds an index over every trajectory of a trajectory store."""
+        return cls(store.points, store.offsets, cell_size=cell_size)
+
+    def _key(self, step, row, column):
+        return (step * self.shape[1] + row) * self.shape[0] + column
+
+    def query(self, step, position, radius, return_distance=False):
+        """Returns ids of trajectories whose point at ``step`` lies within ``radius`` of ``position``."""
+        position = np.asarray(position, dtype=np.float64)
+        low = np.floor((position - radius - self.origin) / self.cell_size).astype(np.int64)
+        high = np.floor((position + radius - self.origin) / self.cell_size).astype(np.int64)
+        low = np.maximum(low, 0)
+        high = np.minimum(high, self.shape - 1)
+        if step < 0 or np.any(low > high):
+            ids = np.empty(0, dtype=self.owner.dtype)
+            return (ids, np.empty(0)) if return_distance else ids
+
+        # Cells of one grid row are contiguous in key order, so each row is one slice
+        rows = np.arange(low[1], high[1] + 1)
+        starts = np.searchsorted(self.keys, self._key(step, rows, low[0]), side="left")
+        ends = np.searchsorted(self.keys, self._key(step, rows, high[0]), side="right")
+        counts = ends - starts
+        slots = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        distances = np.hypot(*(self.points[slots] - position).T)
+        within = distances <= radius
+        ids = self.owner[slots[within]]
+        return (ids, distances[within]) if return_distance else ids
@@ -0,0 +1,95 @@
+"""Deterministic checks of the fast matching structures against brute-force scans.
+
+Run with ``python -m pytest`` from this folder, or ``python test_equivalence.py``.
+"""
+import tempfile
+
+import numpy as np
+
+import trajstore
+from matcher import PrefixMatcher
+from noise import UniformNoise, apply_models
+from online import Predictor
+from roundabout import generate_trajectories
+from spatial import TrajectoryIndex
+
+
+def noisy_trajectories(num_objects=300, seed=0):
+    points, offsets, speeds, _, _ = generate_trajectories(num_objects, seed=seed)
+    points, offsets = apply_models(points, offsets, [UniformNoise(0.1)], np.random.default_rng(seed))
+    return points, offsets, speeds
+
+
+def test_index_query_matches_scan():
+    points, offsets, _ = noisy_trajectories()
+    trajectories = [points[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+    index = TrajectoryIndex(points, offsets, cell_size=1.0)
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        step = int(rng.integers(0, 120))
+        position = rng.uniform(-15, 15, size=2)
+        radius = float(rng.uniform(0.2, 4.0))
+        expected = [i for i, trajectory in enumerate(trajectories)
+                    if step < len(trajectory) and np.hypot(*(trajectory[step] - position)) <= radius]
+        ids, distances = index.query(step, position, radius, return_distance=True)
+        assert sorted(ids.tolist()) == expected
+        for i, distance in zip(ids, distances):
+            assert np.isclose(distance, np.hypot(*(trajectories[i][step] - position)))
+
+
+def test_prefix_mse_matches_scan():
+    points, offsets, _ = noisy_trajectories()
+    trajectories = [points[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+    padded, lengths = trajstore.pad(points, offsets)
+    matcher = PrefixMatcher(padded, lengths, exclude=[0])
+    for step, point in enumerate(trajectories[0]):
+        matcher.observe(point)
+        observed = trajectories[0][:step + 1]
+        expected = np.full(len(trajectories), np.inf)
+        for i, trajectory in enumerate(trajectories[1:], start=1):
+            overlap = min(len(observed), len(trajectory))
+            expected[i] = ((observed[:overlap] - trajectory[:overlap]) ** 2).sum(axis=1).mean()
+        assert np.allclose(matcher.scores(), expected, rtol=1e-4, atol=1e-6)
+        assert matcher.best()[0][0] == np.argmin(expected)
+
+
+def test_online_best_matches_scan():
+    points, offsets, speeds = noisy_trajectories()
+    trajectories = [points[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+    test_ids = [0, 1, 2]
+    with tempfile.TemporaryDirectory() as directory:
+        trajstore.write_store(f"{directory}/data.traj", points, offsets, speeds=speeds)
+        store = trajstore.load(f"{directory}/data.traj")
+        predictor = Predictor(store, 2.0, 3.0, exclude=test_ids)
+
+        # The original predictor.py loop: filter by position at every step, keep the closest
+        candidates, diverged = {}, set()
+        for frame_idx in range(max(len(trajectories[i]) for i in test_ids)):
+            for track_id in test_ids:
+                if frame_idx < len(trajectories[track_id]):
+                    predictor.update(track_id, trajectories[track_id][frame_idx])
+            predictor.flush()
+            for track_id in test_ids:
+                observed = trajectories[track_id]
+                if frame_idx >= len(observed) or track_id in diverged:
+                    continue
+                threshold = 2.0 if frame_idx == 0 else 3.0
+                pool = candidates.get(track_id, [i for i in range(len(trajectories)) if i not in test_ids])
+                distances = {i: np.hypot(*(trajectories[i][frame_idx] - observed[frame_idx])) for i in pool
+                             if frame_idx < len(trajectories[i])}
+                candidates[track_id] = [i for i, distance in distances.items() if distance <= threshold]
+                if not candidates[track_id]:
+                    diverged.add(track_id)  # The original gives up here; the re-search takes over
+                    continue
+                best = min(candidates[track_id], key=distances.get)
+                state = predictor.tracks[track_id]
+                assert sorted(state.candidate_ids.tolist()) == sorted(candidates[track_id])
+                assert state.best_id == best
+            predictor.end_frame()
+
+
+if __name__ == "__main__":
+    test_index_query_matches_scan()
+    test_prefix_mse_matches_scan()
+    test_online_best_matches_scan()
+    print("All checks passed")
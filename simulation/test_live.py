@@ -0,0 +1,85 @@
+"""Checks of the live service's frame handling with a fake input stream and a fake engine.
+
+Run with ``python -m pytest`` from this folder, or ``python test_live.py``.
+"""
+import asyncio
+import json
+import time
+
+import live
+
+
+class SlowEngine:
+    """Records every call and takes ``delay`` seconds per predicted track."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.updates = []
+        self.frames = 0
+
+    def update(self, track_id, point):
+        self.updates.append((track_id, point))
+
+    def predict(self, track_id, horizon=50):
+        time.sleep(self.delay)
+        return [(0.0, 0.0)] * horizon
+
+    def end_frame(self):
+        self.frames += 1
+
+
+async def stream(frames):
+    """Yields one ``track_id, t, x, y`` line per frame, sleeping the given seconds before each."""
+    for t, pause in enumerate(frames):
+        await asyncio.sleep(pause)
+        yield f"1, {t}, {t}.0, 0.0\n".encode()
+        yield b"\n"
+
+
+def serve(frames, engine, **options):
+    """Runs ``handle`` over a fake stream and returns its stats and the records it wrote."""
+    lines = []
+
+    async def write(text):
+        lines.extend(text.splitlines())
+
+    stats = asyncio.run(live.handle(stream(frames), write, engine, horizon=3, **options))
+    return stats, [json.loads(line) for line in lines]
+
+
+def test_every_frame_predicted_when_engine_keeps_up():
+    engine = SlowEngine()
+    stats, records = serve([0.0] * 5, engine, queue_size=8, deadline=1.0)
+    assert stats == {"frames": 5, "dropped": 0, "late": 0}
+    assert [record["t"] for record in records] == list(range(5))
+    assert all(len(record["predictions"]["1"]) == 3 for record in records)
+
+
+def test_backlog_is_dropped_but_every_update_applied():
+    engine = SlowEngine(delay=0.05)
+    stats, records = serve([0.0] * 30, engine, queue_size=2, deadline=10.0)
+    assert stats["frames"] == 30 and stats["dropped"] > 0
+    assert sorted(record["t"] for record in records) == list(range(30))
+    assert sum(record.get("dropped", False) for record in records) == stats["dropped"]
+    # Skipped frames still reach the engine, in order, so its tracks stay consistent
+    assert [point[0] for _, point in engine.updates] == [float(t) for t in range(30)]
+    assert engine.frames == 30
+    assert "predictions" in max(records, key=lambda record: record["t"])  # The newest frame is predicted
+
+
+def test_sender_pause_with_stale_backlog():
+    # Both frames are past the deadline by the time the busy engine looks at them, and no more arrive yet
+    engine = SlowEngine(delay=0.2)
+    stats, records = serve([0.0, 0.05, 1.0], engine, queue_size=8, deadline=0.1)
+    assert stats["frames"] == 3
+    assert sorted(record["t"] for record in records) == [0, 1, 2]
+    by_t = {record["t"]: record for record in records}
+    assert "predictions" in by_t[1] and by_t[1]["latency_ms"] > 100  # Answered late rather than skipped
+    assert engine.frames == 3
+
+
+if __name__ == "__main__":
+    test_every_frame_predicted_when_engine_keeps_up()
+    test_backlog_is_dropped_but_every_update_applied()
+    test_sender_pause_with_stale_backlog()
+    print("All checks passed")
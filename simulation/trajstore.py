@@ -0,0 +1,238 @@
+"""Binary columnar storage for trajectory datasets.
+
+A store is a directory holding one flat ``points.npy`` array of shape (P, 2),
+an ``offsets.npy`` array of length N + 1 delimiting each trajectory, the
+per-object metadata arrays ``ids.npy``, ``classes.npy`` and ``speeds.npy``,
+and a small ``meta.json``. Arrays are opened with memory mapping, so indexing
+a store returns zero-copy views instead of parsed Python lists.
+"""
+import ast
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+FORMAT_VERSION = 1
+STORE_SUFFIX = ".traj"
+
+_LABEL_PATTERN = re.compile(r"^(.*?)(\d+)$")
+
+
+class TrajectoryStore:
+    """Read-only view over a binary trajectory store."""
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            meta = json.load(file)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported trajectory store version in {path}: {meta.get('version')}")
+        self.class_names = meta["class_names"]
+        self.points = np.load(os.path.join(path, "points.npy"), mmap_mode=mode)
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode=mode)
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode=mode)
+        self.classes = np.load(os.path.join(path, "classes.npy"), mmap_mode=mode)
+        self.speeds = np.load(os.path.join(path, "speeds.npy"), mmap_mode=mode)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        """Returns the points of one trajectory as a view into the flat array."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.points[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def lengths(self):
+        """Number of points in each trajectory."""
+        return np.diff(self.offsets)
+
+    def label(self, index):
+        """Reconstructs the original text label, e.g. ``object 1`` or ``car7``."""
+        return f"{self.class_names[self.classes[index]]}{self.ids[index]}"
+
+
+def pack(trajectories):
+    """Packs a sequence of point lists into flat points and offsets arrays."""
+    lengths = [len(trajectory) for trajectory in trajectories]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if offsets[-1] == 0:
+        return np.empty((0, 2), dtype=np.float32), offsets
+    points = np.concatenate([np.asarray(trajectory).reshape(-1, 2) for trajectory in trajectories if len(trajectory)])
+    return points, offsets
+
+
+def pad(points, offsets, fill=np.nan, dtype=np.float32):
+    """Scatters flat trajectories into an (N, max_length, 2) matrix plus their lengths."""
+    lengths = np.diff(offsets)
+    padded = np.full((len(lengths), lengths.max(initial=0), 2), fill, dtype=dtype)
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    padded[owner, np.arange(len(points)) - offsets[owner]] = points
+    return padded, lengths
+
+
+def points_at(points, offsets, step):
+    """Returns the point at ``step`` of every trajectory that is still running at that step."""
+    starts = np.asarray(offsets[:-1])
+    running = np.diff(offsets) > step
+    return points[starts[running] + step]
+
+
+def write_store(path, points, offsets, ids=None, classes=None, speeds=None, class_names=None):
+    """Writes flat trajectory arrays and metadata to a store directory."""
+    points = np.asarray(points).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_objects = len(offsets) - 1
+    if offsets[-1] != len(points):
+        raise ValueError(f"Offsets end at {offsets[-1]} but there are {len(points)} points")
+
+    # Pixel tracks stay integral; simulated coordinates are stored as float32
+    point_dtype = np.int32 if np.issubdtype(points.dtype, np.integer) else np.float32
+    if ids is None:
+        ids = np.arange(1, num_objects + 1)
+    if classes is None:
+        classes = np.zeros(num_objects)
+    if speeds is None:
+        speeds = np.full(num_objects, np.nan)
+    if class_names is None:
+        class_names = ["object "]
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "points.npy"), points.astype(point_dtype, copy=False))
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+    np.save(os.path.join(path, "ids.npy"), np.asarray(ids, dtype=np.int32))
+    np.save(os.path.join(path, "classes.npy"), np.asarray(classes, dtype=np.int16))
+    np.save(os.path.join(path, "speeds.npy"), np.asarray(speeds, dtype=np.float32))
+    with open(os.path.join(path, "meta.json"), "w") as file:
+        json.dump({"version": FORMAT_VERSION, "class_names": list(class_names)}, file)
+
+
+class StoreWriter:
+    """Builds a store chunk by chunk, so datasets larger than memory can be written.
+
+    Chunks are appended to raw part files; ``close`` prepends the ``.npy``
+    headers once the final sizes are known.
+    """
+
+    def __init__(self, path, class_names=None, point_dtype=np.float32):
+        self.path = path
+        self.class_names = ["object "] if class_names is None else list(class_names)
+        self.dtypes = {
+            "points": np.dtype(point_dtype), "offsets": np.dtype(np.int64), "ids": np.dtype(np.int32),
+            "classes": np.dtype(np.int16), "speeds": np.dtype(np.float32),
+        }
+        self.counts = dict.fromkeys(self.dtypes, 0)
+        os.makedirs(path, exist_ok=True)
+        self.parts = {name: open(os.path.join(path, name + ".part"), "wb") for name in self.dtypes}
+        self._write("offsets", np.zeros(1))
+
+    def _write(self, name, values):
+        values = np.ascontiguousarray(values, dtype=self.dtypes[name])
+        self.parts[name].write(values.tobytes())
+        self.counts[name] += len(values)
+
+    def append(self, points, offsets, ids=None, classes=None, speeds=None):
+        """Appends a chunk given with chunk-local offsets starting at 0."""
+        offsets = np.asarray(offsets, dtype=np.int64)
+        num_objects = len(offsets) - 1
+        first_id = self.counts["ids"] + 1
+        self._write("offsets", offsets[1:] + self.counts["points"])
+        self._write("points", np.asarray(points).reshape(-1, 2))
+        self._write("ids", np.arange(first_id, first_id + num_objects) if ids is None else ids)
+        self._write("classes", np.zeros(num_objects) if classes is None else classes)
+        self._write("speeds", np.full(num_objects, np.nan) if speeds is None else speeds)
+
+    def close(self):
+        for name, part in self.parts.items():
+            part.close()
+            shape = (self.counts[name], 2) if name == "points" else (self.counts[name],)
+            header = {"descr": np.lib.format.dtype_to_descr(self.dtypes[name]), "fortran_order": False, "shape": shape}
+            part_path = os.path.join(self.path, name + ".part")
+            with open(os.path.join(self.path, name + ".npy"), "wb") as file, open(part_path, "rb") as raw:
+                np.lib.format.write_array_header_1_0(file, header)
+                shutil.copyfileobj(raw, file)
+            os.remove(part_path)
+        with open(os.path.join(self.path, "meta.json"), "w") as file:
+            json.dump({"version": FORMAT_VERSION, "class_names": self.class_names}, file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse_line(line):
+    """Parses one ``label -> [(x, y), ...] (speed: s)`` text line."""
+    label, trajectory_data = line.split("->", 1)
+    speed = np.nan
+    if "(speed:" in trajectory_data:
+        trajectory_data, speed_data = trajectory_data.split("(speed:")
+        speed = float(speed_data.strip().rstrip(")"))
+    trajectory = ast.literal_eval(trajectory_data.strip())
+    return label.strip(), trajectory, speed
+
+
+def convert_text(text_path, store_path=None):
+    """Converts a legacy text trajectory file into a binary store."""
+    if store_path is None:
+        store_path = os.path.splitext(text_path)[0] + STORE_SUFFIX
+
+    trajectories, ids, classes, speeds = [], [], [], []
+    class_names = {}
+    with open(text_path, "r") as file:
+        for line in file:
+            if "->" not in line:
+                continue
+            label, trajectory, speed = parse_line(line)
+            match = _LABEL_PATTERN.match(label)
+            name, object_id = (match.group(1), int(match.group(2))) if match else (label, 0)
+            classes.append(class_names.setdefault(name, len(class_names)))
+            ids.append(object_id)
+            speeds.append(speed)
+            trajectories.append(trajectory)
+
+    points, offsets = pack(trajectories)
+    write_store(store_path, points, offsets, ids, classes, speeds, list(class_names))
+    return store_path
+
+
+def export_text(store, text_path):
+    """Writes a store back out in the legacy text format."""
+    with open(text_path, "w") as file:
+        for index in range(len(store)):
+            trajectory = [tuple(point) for point in store[index].tolist()]
+            line = f"{store.label(index)} -> {trajectory}"
+            if not np.isnan(store.speeds[index]):
+                line += f" (speed: {float(store.speeds[index])})"
+            file.write(line + "\n")
+
+
+def load(path, mmap=True):
+    """Opens a store, converting a legacy text file (once, cached beside it) when given one."""
+    if os.path.isdir(path):
+        return TrajectoryStore(path, mmap=mmap)
+
+    store_path = os.path.splitext(path)[0] + STORE_SUFFIX
+    meta_path = os.path.join(store_path, "meta.json")
+    if not os.path.exists(meta_path) or os.path.getmtime(meta_path) < os.path.getmtime(path):
+        convert_text(path, store_path)
+    return TrajectoryStore(store_path, mmap=mmap)
+
+
+if __name__ == "__main__":
+    import sys
+
+    for text_path in sys.argv[1:]:
+        print(f"{text_path} -> {convert_text(text_path)}")